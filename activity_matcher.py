@@ -0,0 +1,35 @@
+import pandas as pd
+import numpy as np
+import re
+from typing import Iterable, Optional
+
+class ActivityPrefixMatcher:
+    """
+    Match VSIC activity codes against a list of code prefixes over a whole column at once.
+    A code matches a prefix when it starts with the prefix and has at least one more digit,
+    the same rule as the previous per-row r'^<prefix>[\\d]+' searches.
+    """
+
+    DEFAULT_PREFIXES = ['162', '20', '22', '24', '25', '26', '27']
+
+    def __init__(self, prefixes: Optional[Iterable[str]] = None):
+        if prefixes is None:
+            prefixes = self.DEFAULT_PREFIXES
+        self.prefixes = sorted({str(p).strip() for p in prefixes if str(p).strip()}, key=len, reverse=True)
+        if self.prefixes:
+            self.pattern = re.compile(r"^(?:" + '|'.join(map(re.escape, self.prefixes)) + r")\d+")
+        else:
+            self.pattern = None
+
+    def match(self, codes: pd.Series) -> np.ndarray:
+        """Return a boolean mask of the codes in the series starting with one of the prefixes"""
+        if self.pattern is None:
+            return np.zeros(len(codes), dtype=bool)
+        # Activity codes repeat heavily, so the pattern only runs once per distinct code
+        labels, uniques = pd.factorize(codes, use_na_sentinel=True)
+        hits = pd.Series(uniques, dtype=object).astype(str).str.match(self.pattern).to_numpy(dtype=bool)
+        hits = np.append(hits, False)
+        return hits[labels]
+
+    def __call__(self, codes: pd.Series) -> np.ndarray:
+        return self.match(codes)
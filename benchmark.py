@@ -0,0 +1,223 @@
+import pandas as pd
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+from synthetic_registry import SyntheticRegistryGenerator
+from preprocess_excel_file import AdvancedExcelProcessor
+from industrial_park_classifier import IndustrialParkClassifier
+from general_database import VNBusinessImporter
+from registry_sources import read_registry
+from query_functions import QueryPrompter, PotentialCustomers
+from shareholder_graph import ShareholderGraph
+from duplicate_detection import DuplicateDetector
+
+STAGES = ['generate', 'ingest', 'preprocess', 'park_classifier', 'import', 'query', 'classify', 'graph', 'dedup']
+
+class PeakMemorySampler:
+    """
+    Record how far the resident memory of the process grows above its level at the start
+    of a stage while the stage runs, by polling /proc/self/statm from a background thread.
+    Falls back to the tracemalloc peak of Python allocations made during the stage where
+    /proc is not available.
+    """
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = 0
+        self.start_rss = 0
+        self.use_proc = os.path.exists('/proc/self/statm')
+        self.__max_rss = 0
+        self.__stop = threading.Event()
+
+    @staticmethod
+    def __rss() -> int:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    def __poll(self):
+        while not self.__stop.is_set():
+            self.__max_rss = max(self.__max_rss, self.__rss())
+            self.__stop.wait(self.interval)
+
+    def __enter__(self):
+        if self.use_proc:
+            self.start_rss = self.__max_rss = self.__rss()
+            self.__thread = threading.Thread(target=self.__poll, daemon=True)
+            self.__thread.start()
+        else:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.use_proc:
+            self.__stop.set()
+            self.__thread.join()
+            self.peak = max(self.__max_rss, self.__rss()) - self.start_rss
+        else:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return False
+
+
+class RegistryBenchmark:
+    """
+    Run the import and query stages against synthetic registries of increasing size and
+    append throughput and peak memory per stage to a JSON lines results file, tagged with
+    the current git commit so runs can be compared across commits.
+
+    Stages that need PostgreSQL expect a database with the areas and industrial_parks
+    tables already set up (see postgres_setup_scripts); use a dedicated benchmark database,
+    the import stage inserts into it.
+    """
+    def __init__(self, db_params: Dict[str, str], results_file: str = 'bench_results.jsonl', seed: int = 0):
+        self.db_params = db_params
+        self.results_file = Path(results_file)
+        self.generator = SyntheticRegistryGenerator(seed=seed)
+        self.commit = self.__git_commit()
+
+    @staticmethod
+    def __git_commit() -> str:
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  cwd=Path(__file__).parent, check=True).stdout.strip()
+        except Exception:
+            return 'unknown'
+
+    def measure(self, stage: str, rows: int, func: Callable):
+        with PeakMemorySampler() as memory:
+            start = time.perf_counter()
+            result = func()
+            seconds = time.perf_counter() - start
+        record = {
+            'commit': self.commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'stage': stage,
+            'rows': rows,
+            'seconds': round(seconds, 4),
+            'rows_per_second': round(rows / seconds, 1) if seconds > 0 else None,
+            'peak_memory_mb': round(memory.peak / 2**20, 1),
+        }
+        with open(self.results_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        rate = record['rows_per_second'] if record['rows_per_second'] is not None else '-'
+        print(f"{stage:>16} {rows:>9} rows  {seconds:9.3f}s  {rate:>12} rows/s  {record['peak_memory_mb']:>8} MB")
+        return result
+
+    def run(self, sizes: List[int], stages: List[str]):
+        for rows in sizes:
+            df = self.measure('generate', rows, lambda: self.generator.generate(rows))
+            if 'ingest' in stages:
+                with tempfile.TemporaryDirectory() as tmp:
+                    for suffix, write in [('xlsx', df.to_excel), ('csv', df.to_csv), ('parquet', df.to_parquet)]:
+                        path = Path(tmp) / f"registry.{suffix}"
+                        write(path, index=False)
+                        self.measure(f"ingest:{suffix}", rows, lambda: read_registry(path))
+            if 'preprocess' in stages:
+                with tempfile.TemporaryDirectory() as tmp:
+                    raw_path = Path(tmp) / 'raw.xlsx'
+                    self.generator.generate_raw(rows).to_excel(raw_path, index=False, header=False)
+                    def preprocess():
+                        processor = AdvancedExcelProcessor(str(raw_path))
+                        processor.load_file(header=None)
+                        processor.remove_title_rows()
+                        processor.clean_data()
+                    self.measure('preprocess', rows, preprocess)
+            if 'park_classifier' in stages:
+                classifier = IndustrialParkClassifier(self.db_params)
+                addresses = df['address'].tolist()
+                self.measure('park_classifier', rows, lambda: [classifier.classify_(a) for a in addresses])
+            if 'import' in stages:
+                importer = VNBusinessImporter(self.db_params, 'synthetic')
+                self.measure('import', rows, lambda: importer.import_data(df))
+            if 'query' in stages:
+                prompter = QueryPrompter(self.db_params)
+                # Answer the capital prompt without user input
+                prompter.verify_capital_input = lambda: 0
+                for name in ['all_businesses_capital_query', 'industrial_park_business_capital_query',
+                             'industrial_park_businesses_all_query', 'industrial_park_businesses_count']:
+                    query, params, _ = getattr(prompter, name)()
+                    self.measure(f"query:{name}", rows, lambda: prompter.query_data_raw(query, params))
+                def browse_all(name, page_size=1000):
+                    token = ''
+                    while token is not None:
+                        _, token = prompter.browse(name, page_size, token or None)
+                self.measure("query:page:industrial_park_businesses_all_query", rows,
+                             lambda: prompter.browse('industrial_park_businesses_all_query', 1000))
+                self.measure("query:pages:industrial_park_businesses_all_query", rows,
+                             lambda: browse_all('industrial_park_businesses_all_query'))
+                for text in [df['reg_number'].iloc[0][:6], df['business_name'].iloc[0].split()[-2].lower(), 'khu cong nghiep']:
+                    query, params, _ = prompter.business_search(text)
+                    self.measure(f"query:business_search:{text}", rows, lambda: prompter.query_data_raw(query, params))
+                print(prompter.query_stats().round(2))
+                prompter.executor.close()
+            if 'classify' in stages:
+                customers = self.measure('classify:load', rows, lambda: PotentialCustomers(self.db_params))
+                self.measure('classify', rows, customers.classify)
+                self.measure('classify:score_leads', rows, customers.score_leads)
+            if 'graph' in stages:
+                graph = self.measure('graph:build', rows, lambda: ShareholderGraph.from_database(self.db_params))
+                self.measure('graph:groups', rows, lambda: graph.group)
+                sample = graph.business_id[:100]
+                self.measure('graph:k_hop', rows, lambda: [graph.k_hop(b, 2) for b in sample])
+            if 'dedup' in stages:
+                businesses = pd.DataFrame({
+                    'business_id': range(rows),
+                    'name': df['business_name'],
+                    'reg_number': df['reg_number'],
+                    'area_id': df['province'] + '|' + df['district'] + '|' + df['ward'],
+                })
+                self.measure('dedup', rows, lambda: DuplicateDetector().detect(businesses))
+
+    @staticmethod
+    def compare(results_file: str, metric: str = 'rows_per_second') -> pd.DataFrame:
+        """Latest value of a metric for every stage and size, one column per commit"""
+        results = pd.read_json(results_file, lines=True, dtype={'commit': str})
+        table = results.pivot_table(index=['stage', 'rows'], columns='commit', values=metric, aggfunc='last')
+        commits = results.drop_duplicates('commit', keep='last').sort_values('timestamp')['commit']
+        return table[[c for c in commits if c in table.columns]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the registry import and query stages on synthetic data")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    run_parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    run_parser.add_argument('--results', default='bench_results.jsonl')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--host', default='localhost')
+    run_parser.add_argument('--port', default='5432')
+    run_parser.add_argument('--database', default='businessesdb_bench')
+    run_parser.add_argument('--user', default='postgres')
+    run_parser.add_argument('--password', default='1234')
+    compare_parser = subparsers.add_parser('compare')
+    compare_parser.add_argument('--results', default='bench_results.jsonl')
+    compare_parser.add_argument('--metric', default='rows_per_second', choices=['rows_per_second', 'seconds', 'peak_memory_mb'])
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(RegistryBenchmark.compare(args.results, args.metric))
+        return
+    db_params = {
+        'host': args.host,
+        'database': args.database,
+        'user': args.user,
+        'password': args.password,
+        'port': args.port
+    }
+    try:
+        RegistryBenchmark(db_params, args.results, args.seed).run(args.sizes, args.stages)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Iterable, Optional
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Columns whose values repeat heavily (one row per business x activity, or a small set of
+# provinces, parks and business models) and are stored as pandas categoricals
+CATEGORY_COLUMNS = {
+    'act_code', 'name', 'business_name', 'reg_number', 'park_name', 'province',
+    'district', 'ward', 'model', 'status', 'domestic', 'legal_rep', 'main_act', 'co_fund',
+    'shareholders'
+}
+
+# Largest distinct/total ratio for which a column is still converted to a categorical
+MAX_CATEGORY_RATIO = 0.5
+
+# Fixed width dtypes for ids, codes and capital, matching the int/bigint database columns;
+# only applied to columns without missing values whose values fit, so nothing wraps and the
+# values handed to psycopg2 stay plain integers
+INTEGER_COLUMNS = {
+    'business_id': np.int32,
+    'park_id': np.int32,
+    'auth_capital': np.int64,
+    'auth_cap': np.int64,
+    'no': np.int32,
+}
+
+# Text columns holding a comma separated list of entries that repeat across rows, with the
+# pattern of the separating commas (activity "code:description" entries, whose descriptions
+# contain commas too). Stored as Arrow lists of dictionary encoded entries, so each distinct
+# entry is kept once; list_text() gives the original text back.
+LIST_COLUMNS = {
+    'all_act': r",(?=\d{4,}:)",
+}
+
+def list_text(value):
+    """Original text of a LIST_COLUMNS value; plain strings and missing values pass through"""
+    if isinstance(value, (list, np.ndarray)):
+        return ','.join(value)
+    return value
+
+def dictionary_lists(series: pd.Series, separator: str) -> pd.Series:
+    """Split a text column at the separator pattern into Arrow lists of dictionary encoded entries"""
+    entries = series.str.split(separator, regex=True)
+    lists = pa.array([v if isinstance(v, list) else None for v in entries], type=pa.list_(pa.string()))
+    lists = pa.ListArray.from_arrays(lists.offsets, lists.values.dictionary_encode(), mask=lists.is_null())
+    return pd.Series(pd.arrays.ArrowExtensionArray(lists), index=series.index, name=series.name)
+
+def compact_frame(df: pd.DataFrame,
+                  category_columns: Optional[Iterable[str]] = None,
+                  integer_columns: Optional[Dict[str, type]] = None,
+                  string_storage: Optional[str] = 'pyarrow',
+                  list_columns: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Convert a business DataFrame to its compact in-memory representation in place.
+
+    Parameters:
+    df (pd.DataFrame): Frame returned by one of the loaders
+    category_columns: Columns to store as categoricals (default CATEGORY_COLUMNS)
+    integer_columns: Column -> fixed width integer dtype (default INTEGER_COLUMNS)
+    string_storage: 'pyarrow' to store the remaining text columns as Arrow strings when
+                    pyarrow is installed (default), None to leave them as Python objects
+    list_columns: Column -> entry separator pattern of the columns stored as dictionary
+                  encoded lists when pyarrow is installed (default LIST_COLUMNS)
+    """
+    if category_columns is None:
+        category_columns = CATEGORY_COLUMNS
+    if integer_columns is None:
+        integer_columns = INTEGER_COLUMNS
+    if list_columns is None:
+        list_columns = LIST_COLUMNS
+    category_columns = set(category_columns)
+
+    for column in df.columns:
+        series = df[column]
+        if column in list_columns and HAS_PYARROW and pd.api.types.is_string_dtype(series):
+            df[column] = dictionary_lists(series, list_columns[column])
+        elif column in category_columns and not isinstance(series.dtype, pd.CategoricalDtype) and \
+                pd.api.types.is_string_dtype(series) and series.nunique() <= len(series) * MAX_CATEGORY_RATIO:
+            # Mostly unique columns gain nothing from a dictionary encoding and fall through
+            # to the string storage below
+            df[column] = series.astype('category')
+        elif column in integer_columns:
+            dtype = integer_columns[column]
+            if pd.api.types.is_numeric_dtype(series) and series.notna().all() and (
+                    series.empty or np.iinfo(dtype).min <= series.min() and series.max() <= np.iinfo(dtype).max):
+                df[column] = series.astype(dtype)
+        elif string_storage == 'pyarrow' and HAS_PYARROW and series.dtype == object:
+            if pd.api.types.infer_dtype(series, skipna=True) == 'string':
+                df[column] = series.astype('string[pyarrow]')
+    return df
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """Deep memory usage of a frame in bytes"""
+    return int(df.memory_usage(deep=True).sum())
@@ -0,0 +1,177 @@
+import pandas as pd
+import numpy as np
+import re
+import unicodedata
+from rapidfuzz import fuzz
+from rapidfuzz.process import cpdist
+from shareholder_graph import component_labels
+
+def _ascii_fold_table() -> dict:
+    """str.translate table mapping accented Latin letters (Vietnamese included) to their base letter"""
+    table = {ord('đ'): 'd', ord('Đ'): 'D'}
+    for code in range(0x00C0, 0x1F00):
+        base = unicodedata.normalize('NFD', chr(code))[0]
+        if base != chr(code) and base.isascii():
+            table[code] = base
+    return table
+
+ASCII_FOLD = _ascii_fold_table()
+
+# Legal forms written out or abbreviated -> one token each; a branch (chi nhanh), a limited
+# company and a joint stock company of the same name are different businesses
+LEGAL_FORMS = {
+    'trach nhiem huu han': 'tnhh', 'tnhh': 'tnhh',
+    'mot thanh vien': 'mtv', 'mtv': 'mtv', '1tv': 'mtv',
+    'hai thanh vien tro len': 'htv', '2tv': 'htv',
+    'co phan': 'cp', 'cp': 'cp',
+    'doanh nghiep tu nhan': 'dntn', 'dntn': 'dntn',
+    'hop tac xa': 'htx', 'htx': 'htx',
+    'chi nhanh': 'cn',
+    'van phong dai dien': 'vpdd', 'vpdd': 'vpdd',
+}
+LEGAL_FORMS_PATTERN = re.compile(r"\b(?:" + '|'.join(sorted(LEGAL_FORMS, key=len, reverse=True)) + r")\b")
+NUMBER_PATTERN = re.compile(r"\b\d+\b")
+
+def normalize_names(names: pd.Series) -> pd.DataFrame:
+    """
+    Split company names into a lower case, diacritic-free name without punctuation, legal form
+    words or "cong ty", the sorted legal form tokens and the sorted numbers of the name
+    """
+    names = names.fillna('').astype(str).str.translate(ASCII_FOLD).str.lower()
+    names = names.str.replace(r"[^\w\s]", ' ', regex=True).str.replace(r"\b(?:cong ty|cty)\b", ' ', regex=True)
+    forms = names.str.findall(LEGAL_FORMS_PATTERN).map(lambda found: ' '.join(sorted({LEGAL_FORMS[f] for f in found})))
+    numbers = names.str.findall(NUMBER_PATTERN).map(lambda found: ' '.join(sorted(set(found))))
+    names = names.str.replace(LEGAL_FORMS_PATTERN, ' ', regex=True).str.split().str.join(' ')
+    return pd.DataFrame({'name': names, 'form': forms, 'numbers': numbers})
+
+
+class DuplicateDetector:
+    """
+    Find duplicate businesses without comparing every pair of rows.
+
+    Rows are put into blocks by exact registration number and by (area, name token) for
+    every token of the normalized name; tokens shared by more than max_block_size businesses
+    of an area are too common to be informative and their blocks are skipped. Only pairs
+    inside a block are scored, in batches with rapidfuzz. Pairs with the same registration
+    number are linked. Other pairs are linked when their name similarity is at least threshold,
+    their legal forms and the numbers in their names are equal, and they do not carry two
+    different registration numbers. The linked components form the duplicate clusters; a
+    cluster that still reaches several registration numbers through rows without one is split
+    by dropping its name links to registered rows. The lowest business id of a cluster is
+    canonical.
+    """
+    def __init__(self, threshold: float = 95.0, max_block_size: int = 200, batch_size: int = 200_000):
+        self.threshold = threshold
+        self.max_block_size = max_block_size
+        self.batch_size = batch_size
+
+    def __block_pairs(self, rows: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        """(row, row) pairs of every block of rows sharing a key, as an (n, 2) array with row a < row b"""
+        order = np.argsort(keys, kind='stable')
+        rows, keys = rows[order], keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(keys)])
+        pairs = [np.empty((0, 2), dtype=np.int64)]
+        # Blocks of the same size are expanded together
+        for size in np.unique(sizes[(sizes > 1) & (sizes <= self.max_block_size)]):
+            members = rows[starts[sizes == size][:, None] + np.arange(size)]
+            a, b = np.triu_indices(size, 1)
+            pairs.append(np.stack([members[:, a].ravel(), members[:, b].ravel()], axis=1))
+        pairs = np.concatenate(pairs)
+        return np.sort(pairs, axis=1)
+
+    @staticmethod
+    def registration_codes(df: pd.DataFrame) -> np.ndarray:
+        """Code of every row's registration number, -1 where it is missing or blank"""
+        reg_number = df['reg_number'].astype('string').str.strip().replace('', pd.NA)
+        return pd.factorize(reg_number, use_na_sentinel=True)[0]
+
+    def candidate_pairs(self, df: pd.DataFrame, names: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Distinct name candidate pairs of rows with the same legal form and name numbers and no
+        conflicting registration numbers, and the pairs with equal registration numbers
+        """
+        n_rows = len(df)
+        rows = np.arange(n_rows)
+        reg_codes = self.registration_codes(df)
+        has_reg = reg_codes >= 0
+        same_reg = self.__block_pairs(rows[has_reg], reg_codes[has_reg])
+
+        tokens = names['name'].str.split().explode()
+        tokens = tokens[tokens.notna() & (tokens.str.len() > 1)]
+        token_rows = tokens.index.to_numpy()
+        token_codes, token_uniques = pd.factorize(tokens)
+        area_codes = pd.factorize(df['area_id'].astype('string').fillna(''))[0]
+        keys = area_codes[token_rows].astype(np.int64) * max(len(token_uniques), 1) + token_codes
+        token_pairs = self.__block_pairs(token_rows, keys)
+
+        a, b = token_pairs[:, 0], token_pairs[:, 1]
+        form_codes = pd.factorize(names['form'])[0]
+        number_codes = pd.factorize(names['numbers'])[0]
+        keep = ((form_codes[a] == form_codes[b]) & (number_codes[a] == number_codes[b])
+                & ~(has_reg[a] & has_reg[b] & (reg_codes[a] != reg_codes[b])))
+        token_pairs = token_pairs[keep]
+
+        def distinct(pairs):
+            return np.unique(pairs[:, 0] * n_rows + pairs[:, 1])
+        same_reg = distinct(same_reg)
+        return np.setdiff1d(distinct(token_pairs), same_reg, assume_unique=True), same_reg
+
+    @staticmethod
+    def registration_conflicts(cluster: np.ndarray, reg_codes: np.ndarray) -> np.ndarray:
+        """Mask of the clusters holding more than one distinct registration number"""
+        n_clusters = cluster.max() + 1 if len(cluster) else 0
+        known = reg_codes >= 0
+        pairs = np.unique(np.stack([cluster[known], reg_codes[known]], axis=1), axis=0)
+        return np.bincount(pairs[:, 0], minlength=n_clusters) > 1
+
+    def detect(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Duplicate clusters of a frame with business_id, name, reg_number and area_id columns.
+        Returns one row per non-canonical duplicate: business_id, canonical_id and score, the
+        best name similarity to another member of its cluster (100 for equal registration numbers).
+        """
+        df = df.reset_index(drop=True)
+        n_rows = len(df)
+        names = normalize_names(df['name'])
+        candidates, same_reg = self.candidate_pairs(df, names)
+
+        # Order-sensitive similarity: reordered words make a different company name
+        name_values = names['name'].to_numpy(dtype=object)
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        for start in range(0, len(candidates), self.batch_size):
+            batch = candidates[start:start + self.batch_size]
+            a, b = np.divmod(batch, n_rows)
+            scores[start:start + len(batch)] = cpdist(name_values[a], name_values[b], scorer=fuzz.ratio,
+                                                      score_cutoff=self.threshold, workers=-1)
+        matched = scores >= self.threshold
+        name_links, name_scores = candidates[matched], scores[matched]
+        reg_codes = self.registration_codes(df)
+        cluster = component_labels(n_rows, *np.divmod(np.concatenate([name_links, same_reg]), n_rows))
+
+        # A chain of name links through rows without a registration number can still join two
+        # registration numbers; such clusters keep only their name links between unregistered
+        # rows, which splits them into single registration groups and unregistered groups
+        conflict = self.registration_conflicts(cluster, reg_codes)
+        if conflict.any():
+            a, b = np.divmod(name_links, n_rows)
+            keep = ~conflict[cluster[a]] | ((reg_codes[a] < 0) & (reg_codes[b] < 0))
+            name_links, name_scores = name_links[keep], name_scores[keep]
+            cluster = component_labels(n_rows, *np.divmod(np.concatenate([name_links, same_reg]), n_rows))
+
+        linked = np.concatenate([name_links, same_reg])
+        link_scores = np.concatenate([name_scores, np.full(len(same_reg), 100, dtype=np.float32)])
+        a, b = np.divmod(linked, n_rows)
+        business_id = df['business_id'].to_numpy(dtype=np.int64)
+        canonical = np.full(cluster.max() + 1 if n_rows else 0, np.iinfo(np.int64).max)
+        np.minimum.at(canonical, cluster, business_id)
+        best = np.zeros(n_rows, dtype=np.float32)
+        np.maximum.at(best, a, link_scores)
+        np.maximum.at(best, b, link_scores)
+
+        duplicate = canonical[cluster] != business_id
+        return pd.DataFrame({
+            'business_id': business_id[duplicate],
+            'canonical_id': canonical[cluster][duplicate],
+            'score': best[duplicate],
+        }).sort_values(['canonical_id', 'business_id'], ignore_index=True)
@@ -7,14 +7,32 @@ import re
 from industrial_park_classifier import IndustrialParkClassifier
 import numpy as np
 from rapidfuzz.fuzz import ratio, partial_ratio
+from psycopg2.extras import execute_values
+from lead_scoring import LeadSnapshot, LeadScoringEngine
+from compact_frames import compact_frame, list_text
+from staged_pipeline import StagedPipeline
+from registry_sources import read_registry
+from shareholder_graph import ShareholderGraph
+from duplicate_detection import DuplicateDetector
 
 class VNBusinessImporter:
-    def __init__(self, db_params: Dict[str, str], excel_file: str):
+    def __init__(self, db_params: Dict[str, str], excel_file: str, campaign_config: str|None = None,
+                 graph_file: str|None = None):
         self.db_params = db_params
         self.excel_file = excel_file
-        self.classifier = IndustrialParkClassifier(self.db_params)
+        self.graph_file = graph_file
+        self.duplicate_detector = DuplicateDetector()
+        self.__classifier = None
+        self.lead_engine = LeadScoringEngine.from_config(campaign_config)
         self.setup_logging()
         
+    @property
+    def classifier(self) -> IndustrialParkClassifier:
+        """Industrial park classifier, loaded from the database on first use"""
+        if self.__classifier is None:
+            self.__classifier = IndustrialParkClassifier(self.db_params)
+        return self.__classifier
+
     def setup_logging(self):
         logging.basicConfig(
             level=logging.INFO,
@@ -88,6 +106,70 @@ class VNBusinessImporter:
                 type varchar(50),
                 PRIMARY KEY (business_id, shareholder_id)
             );
+
+            CREATE TABLE IF NOT EXISTS potential_customers(
+                campaign varchar(50),
+                business_id int REFERENCES general_businesses(id),
+                park_id int REFERENCES industrial_parks(id),
+                score real,
+                PRIMARY KEY (campaign, business_id)
+            );
+
+            -- Fingerprint of the campaign rules potential_customers was scored with
+            CREATE TABLE IF NOT EXISTS lead_scoring_state(
+                singleton boolean PRIMARY KEY DEFAULT true CHECK (singleton),
+                fingerprint char(64)
+            );
+
+            CREATE INDEX IF NOT EXISTS potential_customers_page_idx
+                ON potential_customers (campaign, park_id, score DESC, business_id);
+
+            -- Keyset pagination keys of the QueryPrompter queries
+            CREATE INDEX IF NOT EXISTS general_businesses_capital_idx
+                ON general_businesses (auth_capital, id);
+            CREATE INDEX IF NOT EXISTS general_businesses_park_idx
+                ON general_businesses (park_id, id);
+
+            -- Business search: diacritic-free lower case copies of name and address with
+            -- trigram indexes, and a prefix index on the registration number
+            CREATE EXTENSION IF NOT EXISTS pg_trgm;
+            CREATE EXTENSION IF NOT EXISTS unaccent;
+
+            CREATE OR REPLACE FUNCTION search_normalize(text) RETURNS text
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+                AS $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$;
+
+            ALTER TABLE general_businesses
+                ADD COLUMN IF NOT EXISTS search_name text
+                    GENERATED ALWAYS AS (search_normalize(name)) STORED,
+                ADD COLUMN IF NOT EXISTS search_address text
+                    GENERATED ALWAYS AS (search_normalize(address)) STORED;
+
+            CREATE INDEX IF NOT EXISTS general_businesses_search_name_idx
+                ON general_businesses USING gin (search_name gin_trgm_ops);
+            CREATE INDEX IF NOT EXISTS general_businesses_search_address_idx
+                ON general_businesses USING gin (search_address gin_trgm_ops);
+            CREATE INDEX IF NOT EXISTS general_businesses_reg_number_idx
+                ON general_businesses (reg_number varchar_pattern_ops);
+
+            -- Duplicate businesses found at import, pointing at the canonical business of their
+            -- cluster; distinct_businesses leaves them out
+            CREATE TABLE IF NOT EXISTS duplicate_businesses(
+                business_id int PRIMARY KEY REFERENCES general_businesses(id),
+                canonical_id int REFERENCES general_businesses(id),
+                score real
+            );
+
+            CREATE INDEX IF NOT EXISTS duplicate_businesses_canonical_idx
+                ON duplicate_businesses (canonical_id);
+
+            CREATE OR REPLACE VIEW distinct_businesses AS
+                SELECT general_businesses.*
+                FROM general_businesses
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM duplicate_businesses
+                        WHERE duplicate_businesses.business_id = general_businesses.id
+                );
             """
             
             cur.execute(schema_sql)
@@ -131,7 +213,6 @@ class VNBusinessImporter:
         """Process district and ward data into admin_divisions table"""
         conn = psycopg2.connect(**self.db_params)
         cur = conn.cursor()
-        self.test_array
         get_id = None
         try:
             if pd.notna(row['province']):
@@ -233,7 +314,7 @@ class VNBusinessImporter:
                     continue
                 all_activities[main_activities[i][0]] = main_activities[i][1]
             # Add other activities
-            other_activities = list(map(lambda y: list(map(lambda x: x.removesuffix(',').split(':'), re.findall(r"[\d]{4,}:[\D]*", str(y)))), df['all_act'].dropna()))
+            other_activities = list(map(lambda y: list(map(lambda x: x.removesuffix(',').split(':'), re.findall(r"[\d]{4,}:[\D]*", str(list_text(y))))), df['all_act'].dropna()))
             for i in range(len(other_activities)):
                 for j in range(len(other_activities[i])):
                     if len(other_activities[i][j]) < 2:
@@ -299,14 +380,225 @@ class VNBusinessImporter:
             cur.close()
             conn.close()
 
-    def import_data(self):
-        """Main import process"""
+    def rebuild_shareholder_graph(self) -> ShareholderGraph:
+        """Rebuild the shareholder network from the database and save it for the query layer"""
+        graph = ShareholderGraph.from_database(self.db_params)
+        path = graph.save(self.graph_file)
+        self.logger.info(f"Saved shareholder graph of {len(graph)} businesses and {graph.n_shareholders} shareholders to {path}")
+        return graph
+
+    def update_duplicates(self) -> pd.DataFrame:
+        """Detect duplicate businesses over the whole registry and replace the duplicate_businesses table"""
+        conn = psycopg2.connect(**self.db_params)
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT id, name, reg_number, area_id FROM general_businesses")
+            businesses = pd.DataFrame(cur.fetchall(), columns=['business_id', 'name', 'reg_number', 'area_id'])
+            duplicates = self.duplicate_detector.detect(businesses)
+            cur.execute("DELETE FROM duplicate_businesses")
+            execute_values(cur, """
+                INSERT INTO duplicate_businesses (business_id, canonical_id, score)
+                VALUES %s
+            """, [(int(b), int(c), float(s)) for b, c, s in duplicates.itertuples(index=False, name=None)])
+            conn.commit()
+            self.logger.info(f"Found {len(duplicates)} duplicate businesses in {duplicates['canonical_id'].nunique()} clusters")
+            return duplicates
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error updating duplicate businesses: {e}")
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    @staticmethod
+    def __lead_fingerprint(cur) -> str|None:
+        cur.execute("SELECT fingerprint FROM lead_scoring_state")
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def refresh_potential_customers(self, force: bool = False) -> bool:
+        """
+        Rescore every business against the configured campaigns and replace potential_customers,
+        dropping the campaigns no longer in the configuration. Skipped when the table was already
+        scored with the current campaign rules, unless force is set. Returns whether it ran.
+        """
+        conn = psycopg2.connect(**self.db_params)
+        cur = conn.cursor()
+        try:
+            fingerprint = self.lead_engine.fingerprint
+            if not force and self.__lead_fingerprint(cur) == fingerprint:
+                return False
+            snapshot = LeadSnapshot.from_database(self.db_params)
+            cur.execute("DELETE FROM potential_customers")
+            for campaign in self.lead_engine.campaigns:
+                leads = self.lead_engine.eligible_leads(snapshot, campaign)
+                execute_values(cur, """
+                    INSERT INTO potential_customers (campaign, business_id, park_id, score)
+                    VALUES %s
+                """, list(leads[['campaign', 'business_id', 'park_id', 'score']].itertuples(index=False, name=None)))
+            cur.execute("""
+                INSERT INTO lead_scoring_state (fingerprint) VALUES (%s)
+                ON CONFLICT (singleton) DO UPDATE SET fingerprint = EXCLUDED.fingerprint
+            """, (fingerprint,))
+            conn.commit()
+            self.logger.info(f"Rescored {len(snapshot)} businesses for {len(self.lead_engine.campaigns)} campaigns")
+            return True
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error rescoring potential customers: {e}")
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    def update_potential_customers(self, cur, businesses: List[Dict], activities: List[tuple], shareholders: List[tuple]):
+        """Score the newly inserted businesses against the configured campaigns and upsert the leads"""
+        if not businesses:
+            return
+        snapshot = LeadSnapshot(
+            pd.DataFrame(businesses),
+            pd.DataFrame(activities, columns=['business_id', 'act_code', 'main_act']).drop_duplicates(['business_id', 'act_code']),
+            pd.DataFrame(shareholders, columns=['business_id', 'shareholder']).drop_duplicates()
+        )
+        for campaign in self.lead_engine.campaigns:
+            leads = self.lead_engine.eligible_leads(snapshot, campaign)
+            execute_values(cur, """
+                INSERT INTO potential_customers (campaign, business_id, park_id, score)
+                VALUES %s
+                ON CONFLICT (campaign, business_id) DO UPDATE
+                    SET park_id = EXCLUDED.park_id, score = EXCLUDED.score
+            """, list(leads[['campaign', 'business_id', 'park_id', 'score']].itertuples(index=False, name=None)))
+        self.logger.info(f"Scored {len(snapshot)} new businesses for potential customers")
+
+    def parse_row(self, row) -> Dict:
+        """Parse the phone numbers, activity codes and shareholders of a registry row"""
+        record = {'row': row, 'phones': self.process_phone_numbers(row['phone'])}
+        record['main_act'] = None
+        if pd.notna(row['main_act']) and row['main_act'] != "--":
+            main_act_code, _ = row['main_act'].split(':')
+            record['main_act'] = main_act_code or None
+        record['other_acts'] = []
+        all_act = list_text(row['all_act'])
+        if pd.notna(all_act):
+            other_acts = list(map(lambda x: x.removesuffix(',').split(':'), re.findall(r"[\d]{4,}:[\D]*", all_act)))
+            record['other_acts'] = [act_code for act_code, _ in other_acts if act_code]
+        record['shareholders'] = []
+        for shareholder_list in ['co_fund', 'shareholders']:
+            if pd.notna(row.get(shareholder_list)):
+                for s in row[shareholder_list].split(','):
+                    s = s.strip().lower()
+                    if s:
+                        record['shareholders'].append((shareholder_list, s))
+        return record
+
+    def resolve_record(self, record: Dict) -> Dict:
+        """Resolve the area and industrial park of a parsed row"""
+        row = record['row']
+        record['area_id'] = self.process_admin_divisions(row)
+        if pd.notna(row['address']):
+            record['park_id'] = self.classifier.classify_(row['address'])
+        else:
+            record['park_id'] = None
+        return record
+
+    def write_record(self, cur, record: Dict, type_map: Dict, shareholder_map: Dict,
+                     new_businesses: List, new_activities: List, new_shareholders: List):
+        """Insert a resolved row and its activities, shareholders and legal representative"""
+        row = record['row']
+        area_id = record['area_id']
+        _park_id = record['park_id']
+        if _park_id != None:
+            cur.execute("""
+                INSERT INTO park_placement (park_id, div_id)
+                VALUES
+                        (%s, %s)
+                ON CONFLICT DO NOTHING
+            """, (_park_id, area_id,))
+
+        cur.execute("""
+            INSERT INTO general_businesses (
+                name, reg_number, address, area_id, park_id, phone, email,
+                auth_capital, type_id, domestic
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (
+            row['business_name'],
+            row['reg_number'],
+            row['address'],
+            area_id,
+            _park_id,
+            record['phones'],
+            row['email'],
+            row['auth_cap'],
+            type_map.get(row['model']),
+            row.get('domestic') == 'TN',
+        ))
+
+        business_id = cur.fetchone()[0]
+        new_businesses.append({
+            'business_id': business_id,
+            'name': row['business_name'],
+            'reg_number': row['reg_number'],
+            'auth_capital': row['auth_cap'],
+            'park_id': _park_id,
+            'domestic': row.get('domestic') == 'TN',
+        })
+
+        # Insert business activities
+        if record['main_act'] is not None:
+            cur.execute("""
+                INSERT INTO business_act (business_id, act_code, main_act)
+                VALUES (%s, %s, %s)
+                ON CONFLICT DO NOTHING
+            """, (business_id, record['main_act'], True,))
+            new_activities.append((business_id, record['main_act'], True))
+
+        # Process other activities
+        for act_code in record['other_acts']:
+            cur.execute("""
+                INSERT INTO business_act (business_id, act_code, main_act)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (business_id, act_code) DO NOTHING
+            """, (business_id, act_code, False,))
+            new_activities.append((business_id, act_code, False))
+
+        # Process shareholders
+        for shareholder_list, s in record['shareholders']:
+            cur.execute("""
+                INSERT INTO business_shareholder (business_id, shareholder_id, type)
+                VALUES (%s, %s, %s)
+                ON CONFLICT DO NOTHING
+            """, (business_id, shareholder_map[s], shareholder_list,))
+            new_shareholders.append((business_id, shareholder_map[s]))
+
+        if pd.notna(row.get('legal_rep')):
+            rep = row['legal_rep']
+            cur.execute(
+                "INSERT INTO legal_rep (business_id, name) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                (business_id, rep,)
+            )
+
+    def import_data(self, df: pd.DataFrame|None = None, pipelined: bool = True, queue_size: int = 500,
+                    detect_duplicates: bool = True):
+        """
+        Main import process. Imports the given DataFrame, already following the importer
+        column contract, or reads the processed registry file (Excel, CSV or Parquet) when
+        no DataFrame is given.
+        With pipelined=True rows are parsed, resolved and written by concurrent stages
+        connected by bounded queues of queue_size rows. New businesses are scored for the
+        potential customers, or every business when the campaign rules changed since the last
+        scoring. After the import the shareholder graph
+        is rebuilt and, with detect_duplicates=True, the duplicate clusters are recomputed.
+        """
         try:
             # Create schema
             self.create_schema()
 
-            # Read Excel file
-            df = pd.read_excel(self.excel_file)
+            # Read the registry file (Excel, CSV or Parquet)
+            if df is None:
+                df = read_registry(self.excel_file)
+            df = compact_frame(df)
             
             # Process reference data first
             type_map = self.process_business_types(df)
@@ -317,92 +609,44 @@ class VNBusinessImporter:
             conn = psycopg2.connect(**self.db_params)
             cur = conn.cursor()
 
+            new_businesses, new_activities, new_shareholders = [], [], []
+            def write(record):
+                self.write_record(cur, record, type_map, shareholder_map, new_businesses, new_activities, new_shareholders)
             try:
-                for _, row in df.iterrows():
-                    # Insert business
-                    area_key = f"{row['district']}|{row['ward']}"
-                    area_id = self.process_admin_divisions(row)
-                    if pd.notna(row['address']):
-                        _park_id = self.classifier.classify_(row['address'])
-                    else:
-                        _park_id = None
-
-                    if _park_id != None:
-                        cur.execute("""
-                            INSERT INTO park_placement (park_id, div_id)
-                            VALUES
-                                    (%s, %s)
-                            ON CONFLICT DO NOTHING
-                        """, (_park_id, area_id,))
-                    
-                    cur.execute("""
-                        INSERT INTO general_businesses (
-                            name, reg_number, address, area_id, park_id, phone, email,
-                            auth_capital, type_id, domestic
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        RETURNING id
-                    """, (
-                        row['business_name'],
-                        row['reg_number'],
-                        row['address'],
-                        area_id,
-                        _park_id,
-                        self.process_phone_numbers(row['phone']),
-                        row['email'],
-                        row['auth_cap'],
-                        type_map.get(row['model']),
-                        row.get('domestic') == 'TN',
-                    ))
-                    
-                    business_id = cur.fetchone()[0]
-                    
-                    # Insert business activities
-                    if pd.notna(row['main_act']):
-                        if row['main_act'] == "--":
-                            pass
-                        else:
-                            main_act_code, _ = row['main_act'].split(':')
-                            if main_act_code:
-                                cur.execute("""
-                                    INSERT INTO business_act (business_id, act_code, main_act)
-                                    VALUES (%s, %s, %s)
-                                    ON CONFLICT DO NOTHING
-                                """, (business_id, main_act_code, True,))
-
-                    # Process other activities
-                    if pd.notna(row['all_act']):
-                        other_acts =list(map(lambda x: x.removesuffix(',').split(':'), re.findall(r"[\d]{4,}:[\D]*", row['all_act'])))
-                        for act_kv in other_acts:
-                            act_code, _ = act_kv
-                            if act_code:
-                                cur.execute("""
-                                    INSERT INTO business_act (business_id, act_code, main_act)
-                                    VALUES (%s, %s, %s)
-                                    ON CONFLICT (business_id, act_code) DO NOTHING
-                                """, (business_id, act_code, False,))
-
-                    # Process shareholders
-                    for shareholder_list in ['co_fund', 'shareholders']:
-                        if pd.notna(row.get(shareholder_list)):
-                            shareholders = row[shareholder_list].split(',')
-                            for s in shareholders:
-                                s = s.strip().lower()
-                                if s:
-                                    cur.execute("""
-                                        INSERT INTO business_shareholder (business_id, shareholder_id, type)
-                                        VALUES (%s, %s, %s)
-                                        ON CONFLICT DO NOTHING
-                                    """, (business_id, shareholder_map[s], shareholder_list,))
-
-                    if pd.notna(row.get('legal_rep')):
-                        rep = row['legal_rep']
-                        cur.execute(
-                            "INSERT INTO legal_rep (business_id, name) VALUES (%s, %s) ON CONFLICT DO NOTHING",
-                            (business_id, rep,)
-                        )
-                
+                rows = (row for _, row in df.iterrows())
+                if pipelined:
+                    # Parsing, area/park resolution and database writes overlap in separate threads
+                    pipeline = StagedPipeline(rows, [
+                        ('parse', self.parse_row),
+                        ('resolve', self.resolve_record),
+                        ('write', write),
+                    ], maxsize=queue_size)
+                    pipeline.run()
+                    self.logger.info(f"Import pipeline metrics: {pipeline.metrics()}")
+                else:
+                    for row in rows:
+                        write(self.resolve_record(self.parse_row(row)))
+
+                # New rows are scored incrementally while the stored scores follow the current
+                # campaign rules; after a rule change every business is rescored instead
+                rules_changed = self.__lead_fingerprint(cur) != self.lead_engine.fingerprint
+                if not rules_changed:
+                    self.update_potential_customers(cur, new_businesses, new_activities, new_shareholders)
                 conn.commit()
                 self.logger.info(f"Successfully imported all data")
+                if rules_changed:
+                    self.refresh_potential_customers(force=True)
+                try:
+                    self.rebuild_shareholder_graph()
+                except Exception as e:
+                    # The import itself is committed; the graph is rebuilt on the next import or query
+                    self.logger.error(f"Error rebuilding shareholder graph: {e}")
+                if detect_duplicates:
+                    try:
+                        self.update_duplicates()
+                    except Exception:
+                        # Already logged; the previous duplicate clusters stay in place
+                        pass
 
             except Exception as e:
                 conn.rollback()
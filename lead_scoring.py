@@ -0,0 +1,211 @@
+import pandas as pd
+import numpy as np
+import psycopg2
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional
+from activity_matcher import ActivityPrefixMatcher
+from compact_frames import compact_frame
+
+class LeadSnapshot:
+    """
+    Compact columnar snapshot of the businesses used for lead scoring.
+    Business level attributes are stored as one NumPy array per column, activities are
+    stored as a long (business index, act code) pair of arrays.
+    """
+    def __init__(self, businesses: pd.DataFrame, activities: pd.DataFrame, shareholders: Optional[pd.DataFrame] = None):
+        self.business_id = businesses['business_id'].to_numpy(dtype=np.int64)
+        self.name = businesses['name'].to_numpy(dtype=object)
+        self.reg_number = businesses['reg_number'].to_numpy(dtype=object)
+        self.auth_capital = pd.to_numeric(businesses['auth_capital'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        self.park_id = pd.to_numeric(businesses['park_id'], errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+        self.domestic = businesses['domestic'].fillna(False).to_numpy(dtype=bool)
+
+        index_of = pd.Index(self.business_id)
+        act_idx = index_of.get_indexer(activities['business_id'])
+        keep = act_idx >= 0
+        self.act_business_idx = act_idx[keep].astype(np.int64)
+        self.act_code = activities['act_code'][keep].reset_index(drop=True)
+        if 'main_act' in activities.columns:
+            self.act_main = activities['main_act'][keep].fillna(False).to_numpy(dtype=bool)
+        else:
+            self.act_main = np.zeros(len(self.act_business_idx), dtype=bool)
+        self.n_activities = np.bincount(self.act_business_idx, minlength=len(self)).astype(np.int32)
+
+        if shareholders is not None and len(shareholders):
+            sh_idx = index_of.get_indexer(shareholders['business_id'])
+            sh_idx = sh_idx[sh_idx >= 0]
+            self.n_shareholders = np.bincount(sh_idx, minlength=len(self)).astype(np.int32)
+        else:
+            self.n_shareholders = np.zeros(len(self), dtype=np.int32)
+
+    def __len__(self):
+        return len(self.business_id)
+
+    @classmethod
+    def from_database(cls, db_params: Dict[str, str], collapse_duplicates: bool = False) -> "LeadSnapshot":
+        """Load every business, or only the canonical business of each duplicate cluster"""
+        conn = psycopg2.connect(**db_params)
+        cur = conn.cursor()
+        try:
+            cur.execute(f"""
+                SELECT id, name, reg_number, auth_capital, park_id, domestic
+                FROM {'distinct_businesses' if collapse_duplicates else 'general_businesses'}
+            """)
+            businesses = compact_frame(pd.DataFrame(cur.fetchall(), columns=['business_id', 'name', 'reg_number', 'auth_capital', 'park_id', 'domestic']))
+            cur.execute("SELECT business_id, act_code, main_act FROM business_act")
+            activities = compact_frame(pd.DataFrame(cur.fetchall(), columns=['business_id', 'act_code', 'main_act']))
+            cur.execute("SELECT business_id FROM business_shareholder")
+            shareholders = pd.DataFrame(cur.fetchall(), columns=['business_id'])
+            return cls(businesses, activities, shareholders)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+
+class LeadScoringEngine:
+    """
+    Score every business of a LeadSnapshot against weighted rule sets (campaigns) and
+    return the top N leads per industrial park.
+
+    Campaigns are read from a JSON file of the form
+    {"campaigns": [{"name": ..., "top_n": ..., "min_score": ..., "rules": [...]}]}
+    where every rule has a "type", a "weight" and optionally "required": true. Supported
+    rule types and their parameters:
+        activity_prefix:   prefixes, main_only
+        capital_band:      bands = [{"min": ..., "max": ..., "weight": ...}, ...]
+        park:              park_ids (empty or missing = any industrial park)
+        domestic:          value (true = domestic, false = foreign)
+        shareholder_count: min, max
+        activity_count:    min, max
+    """
+
+    DEFAULT_CONFIG = Path(__file__).parent / 'lead_campaigns.json'
+    RESULT_COLUMNS = ['campaign', 'park_id', 'rank', 'business_id', 'name', 'reg_number', 'auth_capital', 'score']
+
+    def __init__(self, campaigns: List[Dict]):
+        self.campaigns = campaigns
+        self.rule_functions = {
+            'activity_prefix': self.__activity_prefix_rule,
+            'capital_band': self.__capital_band_rule,
+            'park': self.__park_rule,
+            'domestic': self.__domestic_rule,
+            'shareholder_count': self.__shareholder_count_rule,
+            'activity_count': self.__activity_count_rule,
+        }
+
+    @classmethod
+    def from_config(cls, config_path: str|Path|None = None) -> "LeadScoringEngine":
+        if config_path is None:
+            config_path = cls.DEFAULT_CONFIG
+        with open(config_path, encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config['campaigns'])
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the campaign rules; scores stored under another fingerprint are stale"""
+        config = json.dumps(self.campaigns, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(config.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def __in_range(values: np.ndarray, low, high) -> np.ndarray:
+        mask = np.ones(len(values), dtype=bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values < high
+        return mask
+
+    def __activity_prefix_rule(self, snapshot: LeadSnapshot, rule: Dict) -> np.ndarray:
+        act_mask = ActivityPrefixMatcher(rule.get('prefixes')).match(snapshot.act_code)
+        if rule.get('main_only', False):
+            act_mask &= snapshot.act_main
+        hits = np.bincount(snapshot.act_business_idx[act_mask], minlength=len(snapshot))
+        return (hits > 0) * float(rule.get('weight', 1))
+
+    def __capital_band_rule(self, snapshot: LeadSnapshot, rule: Dict) -> np.ndarray:
+        score = np.zeros(len(snapshot), dtype=np.float64)
+        for band in rule.get('bands', []):
+            score += self.__in_range(snapshot.auth_capital, band.get('min'), band.get('max')) * float(band.get('weight', 1))
+        if 'bands' not in rule:
+            score += self.__in_range(snapshot.auth_capital, rule.get('min'), rule.get('max')) * float(rule.get('weight', 1))
+        return score
+
+    def __park_rule(self, snapshot: LeadSnapshot, rule: Dict) -> np.ndarray:
+        park_ids = rule.get('park_ids')
+        if park_ids:
+            mask = np.isin(snapshot.park_id, np.asarray(park_ids, dtype=np.int64))
+        else:
+            mask = snapshot.park_id >= 0
+        return mask * float(rule.get('weight', 1))
+
+    def __domestic_rule(self, snapshot: LeadSnapshot, rule: Dict) -> np.ndarray:
+        mask = snapshot.domestic == bool(rule.get('value', True))
+        return mask * float(rule.get('weight', 1))
+
+    def __shareholder_count_rule(self, snapshot: LeadSnapshot, rule: Dict) -> np.ndarray:
+        mask = self.__in_range(snapshot.n_shareholders, rule.get('min'), rule.get('max'))
+        return mask * float(rule.get('weight', 1))
+
+    def __activity_count_rule(self, snapshot: LeadSnapshot, rule: Dict) -> np.ndarray:
+        mask = self.__in_range(snapshot.n_activities, rule.get('min'), rule.get('max'))
+        return mask * float(rule.get('weight', 1))
+
+    def score(self, snapshot: LeadSnapshot, campaign: Dict) -> tuple[np.ndarray, np.ndarray]:
+        """Return the score of every business and the mask of businesses passing the required rules"""
+        score = np.zeros(len(snapshot), dtype=np.float64)
+        eligible = np.ones(len(snapshot), dtype=bool)
+        for rule in campaign.get('rules', []):
+            if rule['type'] not in self.rule_functions:
+                raise ValueError(f"Unknown rule type '{rule['type']}' in campaign '{campaign.get('name')}'")
+            rule_score = self.rule_functions[rule['type']](snapshot, rule)
+            if rule.get('required', False):
+                eligible &= rule_score != 0
+            score += rule_score
+        if 'min_score' in campaign:
+            eligible &= score >= float(campaign['min_score'])
+        return score, eligible
+
+    def eligible_leads(self, snapshot: LeadSnapshot, campaign: Dict) -> pd.DataFrame:
+        """Return every business in an industrial park eligible for the campaign with its score"""
+        score, eligible = self.score(snapshot, campaign)
+        idx = np.flatnonzero(eligible & (snapshot.park_id >= 0))
+        return pd.DataFrame({
+            'campaign': campaign.get('name'),
+            'business_id': snapshot.business_id[idx],
+            'park_id': snapshot.park_id[idx],
+            'score': score[idx],
+        })
+
+    def rank(self, snapshot: LeadSnapshot, campaign: Dict, top_n: Optional[int] = None) -> pd.DataFrame:
+        """Return the top N leads of every industrial park for one campaign"""
+        if top_n is None:
+            top_n = campaign.get('top_n', 10)
+        score, eligible = self.score(snapshot, campaign)
+        idx = np.flatnonzero(eligible & (snapshot.park_id >= 0))
+        # Sort by park, then by descending score and capital, ties broken by business id
+        order = np.lexsort((snapshot.business_id[idx], -snapshot.auth_capital[idx], -score[idx], snapshot.park_id[idx]))
+        idx = idx[order]
+        parks = snapshot.park_id[idx]
+        group_start = np.flatnonzero(np.r_[True, parks[1:] != parks[:-1]]) if len(idx) else np.array([], dtype=np.int64)
+        group_rank = np.arange(len(idx)) - np.repeat(group_start, np.diff(np.r_[group_start, len(idx)]))
+        keep = group_rank < top_n
+        idx = idx[keep]
+        return pd.DataFrame({
+            'campaign': campaign.get('name'),
+            'park_id': snapshot.park_id[idx],
+            'rank': group_rank[keep] + 1,
+            'business_id': snapshot.business_id[idx],
+            'name': snapshot.name[idx],
+            'reg_number': snapshot.reg_number[idx],
+            'auth_capital': snapshot.auth_capital[idx],
+            'score': score[idx],
+        }, columns=self.RESULT_COLUMNS)
+
+    def rank_all(self, snapshot: LeadSnapshot, top_n: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+        return {campaign.get('name'): self.rank(snapshot, campaign, top_n) for campaign in self.campaigns}
@@ -1,64 +1,144 @@
-from general_database import *
-from query_functions import *
-
-def general_setup(fname):
-    db_params = {
-        'host': 'localhost',
-        'database': 'businessesdb',
-        'user': 'postgres',
-        'password': '1234',
-        'port': '5432'
-    }
-    excel_file = fname
-    
-    # Create importer and run import
-    importer = VNBusinessImporter(db_params, excel_file)
-    
-    try:
-        importer.import_data()
-        print("Data import completed successfully!")
-        classifier = PotentialCustomers(db_params)
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return
-
-def main():
-    db_params = {
-        'host': 'localhost',
-        'database': 'businessesdb',
-        'user': 'postgres',
-        'password': '1234',
-        'port': '5432'
-    }
-    while True:
-        try:
-            option = input("1. Read excel file\n"
-                           "2. Query database\n"
-                           "0. Exit\n"
-                           "Option: ")
-            if not 0 <= int(option) <= 2:
-                print("Invalid option")
-                continue
-            elif int(option) == 0:
-                sys.exit(0)
-            elif int(option) == 1:
-                fpath = input()
-                general_setup(fname=fpath)
-            elif int(option) == 2:
-                queryRespond = QueryPrompter(db_parms=db_params)
-                queryRespond.query_results()
-        except KeyboardInterrupt:
-            sys.exit(0)
-        except ValueError:
-            print("Invalid option")
-            continue
-        except Exception as e:
-            print(f"Error: {str(e)}")
-            sys.exit(1)
-
-if __name__ == "__main__":
-    fname = 'dsdn_1997_2024_processed.xlsx'
-    start = time.time()
-    general_setup(fname)
-    end = time.time()
-    print(f"Time taken to import all data = {end-start}")
\ No newline at end of file
+import sys
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+# Heavy modules (pandas, numpy, psycopg2, rapidfuzz, thefuzz) and the database backed
+# components are imported inside the commands that need them, so the menu and --help
+# start without paying for them.
+
+DB_PARAMS = {
+    'host': 'localhost',
+    'database': 'businessesdb',
+    'user': 'postgres',
+    'password': '1234',
+    'port': '5432'
+}
+
+HEAVY_MODULES = ['pandas', 'numpy', 'psycopg2', 'rapidfuzz', 'thefuzz', 'openpyxl']
+
+def general_setup(fname):
+    from general_database import VNBusinessImporter
+    excel_file = fname
+
+    # Create importer and run import
+    importer = VNBusinessImporter(DB_PARAMS, excel_file)
+
+    try:
+        importer.import_data()
+        print("Data import completed successfully!")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return
+
+def pipeline_setup(fname, processed_fname=None):
+    from pipeline import RegistryPipeline
+    try:
+        RegistryPipeline(DB_PARAMS, fname, processed_fname).run()
+        print("Data import completed successfully!")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return
+
+def query_setup(slow_ms=500.0, explain_slow=False, collapse_duplicates=False):
+    from query_functions import QueryPrompter
+    queryRespond = QueryPrompter(db_params=DB_PARAMS, slow_ms=slow_ms, explain_slow=explain_slow,
+                                 collapse_duplicates=collapse_duplicates)
+    queryRespond.query_results()
+
+def rescore_setup(campaign_config=None):
+    from general_database import VNBusinessImporter
+    importer = VNBusinessImporter(DB_PARAMS, None, campaign_config)
+    try:
+        importer.create_schema()
+        importer.refresh_potential_customers(force=True)
+        print("Potential customers rescored successfully!")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return
+
+def profile_imports():
+    """Report the import time of main and which heavy modules it pulls in at start-up"""
+    probe = f"import sys, main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], capture_output=True,
+                            text=True, cwd=Path(__file__).parent)
+    main_time = None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = [p.strip() for p in line.removeprefix('import time:').split('|')]
+        if len(parts) == 3 and parts[2] == 'main':
+            main_time = int(parts[1])
+    loaded = result.stdout.strip()
+    print(f"Cumulative import time of main: {main_time / 1000 if main_time is not None else '?'} ms")
+    print(f"Heavy modules loaded at start-up: {loaded or 'none'}")
+    return 0 if not loaded else 1
+
+def main():
+    while True:
+        try:
+            option = input("1. Read excel file\n"
+                           "2. Query database\n"
+                           "3. Preprocess and import raw registry file\n"
+                           "0. Exit\n"
+                           "Option: ")
+            if not 0 <= int(option) <= 3:
+                print("Invalid option")
+                continue
+            elif int(option) == 0:
+                sys.exit(0)
+            elif int(option) == 1:
+                fpath = input()
+                general_setup(fname=fpath)
+            elif int(option) == 2:
+                query_setup()
+            elif int(option) == 3:
+                fpath = input("Raw registry file: ")
+                processed_path = input("Save processed file to (leave empty to skip): ").strip()
+                pipeline_setup(fname=fpath, processed_fname=processed_path or None)
+        except KeyboardInterrupt:
+            sys.exit(0)
+        except ValueError:
+            print("Invalid option")
+            continue
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+
+def cli():
+    parser = argparse.ArgumentParser(description="Vietnamese business registry tools")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('menu', help="Interactive menu")
+    import_parser = subparsers.add_parser('import', help="Import a processed registry file, xlsx, csv or parquet (default command)")
+    import_parser.add_argument('fname', nargs='?', default='dsdn_1997_2024_processed.xlsx')
+    pipeline_parser = subparsers.add_parser('pipeline', help="Preprocess and import a raw registry file")
+    pipeline_parser.add_argument('fname')
+    pipeline_parser.add_argument('--save-processed', metavar='PATH')
+    query_parser = subparsers.add_parser('query', help="Query the database")
+    query_parser.add_argument('--slow-ms', type=float, default=500.0, help="Log queries slower than this to slow_queries.log")
+    query_parser.add_argument('--explain-slow', action='store_true', help="Add the EXPLAIN plan to slow query records")
+    query_parser.add_argument('--collapse-duplicates', action='store_true', help="Show one business per duplicate cluster")
+    rescore_parser = subparsers.add_parser('rescore-leads', help="Rescore every business against the lead campaigns")
+    rescore_parser.add_argument('--config', metavar='PATH', help="Campaign configuration (default lead_campaigns.json)")
+    subparsers.add_parser('profile-imports', help="Check the start-up import cost")
+    args = parser.parse_args()
+
+    if args.command == 'menu':
+        main()
+    elif args.command == 'pipeline':
+        pipeline_setup(args.fname, args.save_processed)
+    elif args.command == 'query':
+        query_setup(args.slow_ms, args.explain_slow, args.collapse_duplicates)
+    elif args.command == 'rescore-leads':
+        rescore_setup(args.config)
+    elif args.command == 'profile-imports':
+        sys.exit(profile_imports())
+    else:
+        fname = getattr(args, 'fname', 'dsdn_1997_2024_processed.xlsx')
+        start = time.time()
+        general_setup(fname)
+        end = time.time()
+        print(f"Time taken to import all data = {end-start}")
+
+if __name__ == "__main__":
+    cli()
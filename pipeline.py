@@ -0,0 +1,160 @@
+import pandas as pd
+import numpy as np
+import logging
+import sys
+import threading
+import argparse
+import time
+from typing import Dict, Optional
+from preprocess_excel_file import AdvancedExcelProcessor, ColumnRuleEngine
+from preprocess_cache import PreprocessCache
+from general_database import VNBusinessImporter
+from registry_sources import RAW_COLUMN_MAP, IMPORT_COLUMNS, contract_columns
+
+def normalize_registry_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turn a cleaned raw registry sheet (read without header) into the importer column contract:
+    find the header row, rename its labels, drop the rows above it and the unlabelled
+    columns, and derive the province from the address when the export has no province column.
+    """
+    if set(IMPORT_COLUMNS[1:4]) <= set(df.columns):
+        return df
+    header_pos = None
+    for i, row in enumerate(df.itertuples(index=False, name=None)):
+        labels = [v for v in row if pd.notna(v)]
+        if labels and len(contract_columns(labels)) * 2 >= len(labels):
+            header_pos = i
+            break
+    if header_pos is None:
+        raise ValueError("Could not find the registry header row")
+
+    header = df.iloc[header_pos].dropna()
+    mapping = contract_columns(list(header))
+    rename = {column: mapping[label] for column, label in header.items() if label in mapping}
+    df = df.iloc[header_pos + 1:][list(rename)].rename(columns=rename).reset_index(drop=True)
+    df = df.replace(r"^\s*$", np.nan, regex=True).infer_objects()
+
+    if 'province' not in df.columns:
+        province = df['address'].str.extract(r"((?:Tỉnh|Thành phố)[^,]+),[^,]*$")[0].str.strip()
+        if province.notna().any():
+            province = province.fillna(province.mode().iloc[0])
+        df['province'] = province
+    for column in IMPORT_COLUMNS:
+        if column not in df.columns:
+            df[column] = np.nan
+    return df[IMPORT_COLUMNS]
+
+
+class RegistryPipeline:
+    """
+    Preprocess a raw registry workbook with AdvancedExcelProcessor and hand the cleaned frame
+    straight to VNBusinessImporter, without the processed xlsx round trip. The processed
+    file can still be written, in a background thread while the import runs.
+    Cleaned frames are cached by input content and rule configuration, so re-running the
+    pipeline on an unchanged file goes straight to the import.
+    """
+
+    # Bump when the preprocessing output changes for the same rules
+    CACHE_VERSION = 1
+
+    def __init__(self, db_params: Dict[str, str], raw_file: str, processed_file: Optional[str] = None,
+                 cache: Optional[PreprocessCache] = None, use_cache: bool = True):
+        self.db_params = db_params
+        self.raw_file = raw_file
+        self.processed_file = processed_file
+        self.cache = (cache or PreprocessCache()) if use_cache else None
+        self.setup_logging()
+
+    def rule_config(self) -> Dict:
+        """Everything the cleaned frame depends on besides the input file"""
+        return {
+            'version': self.CACHE_VERSION,
+            'title_indicators': AdvancedExcelProcessor.TITLE_INDICATORS,
+            'column_rules': ColumnRuleEngine.RULES,
+            'column_map': RAW_COLUMN_MAP,
+        }
+
+    def setup_logging(self):
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            handlers=[
+                logging.FileHandler('import.log'),
+                logging.StreamHandler(sys.stdout)
+            ]
+        )
+        self.logger = logging.getLogger(__name__)
+
+    def preprocess(self) -> pd.DataFrame:
+        key = None
+        if self.cache is not None:
+            key = self.cache.fingerprint(self.raw_file, self.rule_config())
+            df = self.cache.get(key)
+            if df is not None:
+                self.logger.info(f"Using cached preprocessing result for {self.raw_file}")
+                return df
+        df = self.__preprocess()
+        if key is not None:
+            self.cache.put(key, df)
+        return df
+
+    def __preprocess(self) -> pd.DataFrame:
+        processor = AdvancedExcelProcessor(self.raw_file)
+        if not processor.load_file(header=None):
+            raise ValueError(f"Could not load {self.raw_file}")
+        if not processor.remove_title_rows() or not processor.clean_data():
+            raise ValueError(f"Could not preprocess {self.raw_file}")
+        self.logger.info(f"Preprocessed {self.raw_file}: {processor.changes}")
+        return normalize_registry_columns(processor.df)
+
+    def __save_processed(self, df: pd.DataFrame):
+        try:
+            df.to_excel(self.processed_file, index=False)
+            self.logger.info(f"Processed file saved to {self.processed_file}")
+        except Exception as e:
+            self.logger.error(f"Error saving processed file: {str(e)}")
+
+    def run(self):
+        df = self.preprocess()
+        writer = None
+        if self.processed_file is not None:
+            writer = threading.Thread(target=self.__save_processed, args=(df,))
+            writer.start()
+        try:
+            importer = VNBusinessImporter(self.db_params, self.raw_file)
+            # The importer converts columns of its own shallow copy, leaving the writer's frame alone
+            importer.import_data(df.copy(deep=False))
+        finally:
+            if writer is not None:
+                writer.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocess a raw business registry and import it")
+    parser.add_argument('raw_file', help="Raw registry Excel file, e.g. dsdn_1997_2024.xlsx")
+    parser.add_argument('--save-processed', metavar='PATH', help="Also write the processed Excel file")
+    parser.add_argument('--no-cache', action='store_true', help="Always preprocess, ignoring cached results")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', default='5432')
+    parser.add_argument('--database', default='businessesdb')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='1234')
+    args = parser.parse_args()
+    db_params = {
+        'host': args.host,
+        'database': args.database,
+        'user': args.user,
+        'password': args.password,
+        'port': args.port
+    }
+    start = time.time()
+    try:
+        RegistryPipeline(db_params, args.raw_file, args.save_processed, use_cache=not args.no_cache).run()
+        print("Data import completed successfully!")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    print(f"Time taken to preprocess and import all data = {time.time()-start}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import pandas as pd
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import pyarrow
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+class PreprocessCache:
+    """
+    Content-addressed cache of preprocessed DataFrames.
+
+    Entries are keyed by the SHA-256 of the input file's content together with the rule
+    configuration used to process it. The content hash of a file is remembered with its
+    size and mtime, so an unchanged file is not hashed again. Frames are stored as Parquet
+    when pyarrow is installed (pickle otherwise) and the least recently used entries are
+    evicted once the cache grows over max_bytes.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir: str|Path = '.preprocess_cache', max_bytes: int = 1 << 30):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / self.INDEX_FILE
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.index = {}
+
+    def __save_index(self):
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def content_hash(self, file_path: str|Path) -> str:
+        path = Path(file_path).resolve()
+        stat = path.stat()
+        known = self.index.get(str(path))
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha256']
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.index[str(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        self.__save_index()
+        return digest.hexdigest()
+
+    def fingerprint(self, file_path: str|Path, rule_config: Dict) -> str:
+        config = json.dumps(rule_config, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256((self.content_hash(file_path) + config).encode('utf-8')).hexdigest()
+
+    def __entries(self):
+        return [p for p in self.cache_dir.iterdir() if p.suffix in ('.parquet', '.pkl')]
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        for path in (self.cache_dir / f"{key}.parquet", self.cache_dir / f"{key}.pkl"):
+            if path.exists():
+                # Refresh the access time used for eviction
+                os.utime(path)
+                if path.suffix == '.parquet':
+                    return pd.read_parquet(path)
+                with open(path, 'rb') as f:
+                    return pickle.load(f)
+        return None
+
+    def put(self, key: str, df: pd.DataFrame) -> Path:
+        path = None
+        if HAS_PYARROW:
+            path = self.cache_dir / f"{key}.parquet"
+            try:
+                df.to_parquet(path, index=False)
+            except (pyarrow.ArrowException, TypeError, ValueError):
+                # Columns with mixed Python types cannot be stored as Parquet
+                path.unlink(missing_ok=True)
+                path = None
+        if path is None:
+            path = self.cache_dir / f"{key}.pkl"
+            with open(path, 'wb') as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in max_bytes"""
+        entries = sorted(self.__entries(), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in entries)
+        while entries and total > self.max_bytes:
+            oldest = entries.pop(0)
+            total -= oldest.stat().st_size
+            oldest.unlink()
@@ -1,9 +1,154 @@
 import pandas as pd
 import numpy as np
+import re
+import sys
+import heapq
+from functools import lru_cache
 from pathlib import Path
+import openpyxl
+import xlsxwriter
+import pickle
+import tempfile
 from typing import Callable, List, Optional, Dict, Tuple
 
+class ColumnRuleEngine:
+    """
+    Column-type rules used to find values that do not belong in their column.
+    The rule of a column is the first rule whose name appears in the column name
+    (date, email, phone, number); columns without a rule accept any value.
+    """
+
+    RULES = ['date', 'email', 'phone', 'number']
+
+    def __init__(self):
+        self.rule_functions = {
+            'date': self.__is_date,
+            'email': self.__is_email,
+            'phone': self.__is_phone,
+            'number': self.__is_number,
+        }
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def __digit_pattern() -> re.Pattern:
+        # str.isdigit accepts more than the decimal digits matched by \d (e.g. superscripts)
+        digits = ''.join(c for c in map(chr, range(sys.maxunicode + 1)) if c.isdigit())
+        return re.compile('[' + re.escape(digits) + ']')
+
+    @staticmethod
+    def __is_date(values: pd.Series) -> np.ndarray:
+        def parses(x):
+            try:
+                return pd.to_datetime(x, errors='coerce') is not pd.NaT
+            except Exception:
+                return False
+        # Parse every distinct value once
+        codes, uniques = pd.factorize(values)
+        return np.array([parses(x) for x in uniques], dtype=bool)[codes]
+
+    @staticmethod
+    def __is_email(values: pd.Series) -> np.ndarray:
+        return (values.str.contains('@', regex=False) & values.str.contains('.', regex=False)).to_numpy(dtype=bool)
+
+    def __is_phone(self, values: pd.Series) -> np.ndarray:
+        return values.str.contains(self.__digit_pattern(), regex=True).to_numpy(dtype=bool)
+
+    @staticmethod
+    def __is_number(values: pd.Series) -> np.ndarray:
+        return values.str.replace('.', '', regex=False).str.isdigit().to_numpy(dtype=bool)
+
+    def rule_for(self, column_name) -> str|None:
+        for key in self.RULES:
+            if key in str(column_name).lower():
+                return key
+        return None
+
+    def passes(self, rule: str, values: pd.Series) -> np.ndarray:
+        """Evaluate a rule over stripped string values, returning a boolean mask"""
+        if len(values) == 0:
+            return np.zeros(0, dtype=bool)
+        return self.rule_functions[rule](values)
+
+    def misplaced_mask(self, column_name, values: np.ndarray) -> np.ndarray:
+        """Flag the non-empty values failing the rule of their column"""
+        mask = np.zeros(len(values), dtype=bool)
+        rule = self.rule_for(column_name)
+        rows = np.flatnonzero(pd.notna(values))
+        if rule is None or len(rows) == 0:
+            return mask
+        text = pd.Series(values[rows], dtype=object).map(str).str.strip()
+        mask[rows[~self.passes(rule, text)]] = True
+        return mask
+
+    def relocate_misplaced(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[object, np.ndarray]]:
+        """
+        Move every value failing its column rule into the first empty cell of the first
+        other column (in column order) accepting it. Columns are processed in order and a
+        column's misplaced cells become empty slots for the columns processed after it;
+        values no column can take are dropped.
+
+        Returns:
+        Tuple[pd.DataFrame, Dict]: (relocated frame, column -> positions of the changed rows)
+        """
+        columns = list(df.columns)
+        n_cols = len(columns)
+        column_rules = [self.rule_for(c) for c in columns]
+        data = [df.iloc[:, j].to_numpy(dtype=object, copy=True) for j in range(n_cols)]
+        present = [pd.notna(col) for col in data]
+
+        # Evaluate each column's rule once over the whole column
+        misplaced_rows = [np.flatnonzero(self.misplaced_mask(columns[j], data[j])) for j in range(n_cols)]
+
+        # Evaluate every rule once over all misplaced values to know which columns accept them
+        moved_rows = np.concatenate(misplaced_rows) if n_cols else np.zeros(0, dtype=np.int64)
+        moved_cols = np.repeat(np.arange(n_cols), [len(r) for r in misplaced_rows])
+        if len(moved_rows) == 0:
+            return df, {}
+        moved_values = np.array([data[j][i] for i, j in zip(moved_rows, moved_cols)], dtype=object)
+        moved_text = pd.Series(moved_values, dtype=object).map(str).str.strip()
+        rule_pass = {rule: self.passes(rule, moved_text) for rule in set(filter(None, column_rules))}
+        accepts = np.ones((len(moved_rows), n_cols), dtype=bool)
+        for j, rule in enumerate(column_rules):
+            if rule is not None:
+                accepts[:, j] = rule_pass[rule]
+
+        # Plan the relocations with a heap of empty slots per column
+        empty_slots = [np.flatnonzero(~p).tolist() for p in present]
+        placements = []
+        k = 0
+        for j in range(n_cols):
+            n_moved = len(misplaced_rows[j])
+            for i in misplaced_rows[j]:
+                heapq.heappush(empty_slots[j], int(i))
+            for v in range(k, k + n_moved):
+                for target in np.flatnonzero(accepts[v]):
+                    if target != j and empty_slots[target]:
+                        placements.append((heapq.heappop(empty_slots[target]), target, v))
+                        break
+            k += n_moved
+
+        # Apply them in bulk
+        changed_rows = {j: [misplaced_rows[j]] for j in set(moved_cols.tolist())}
+        for j in changed_rows:
+            data[j][misplaced_rows[j]] = np.nan
+        for i, target, v in placements:
+            data[target][i] = moved_values[v]
+            changed_rows.setdefault(target, []).append(np.array([i], dtype=np.int64))
+        df = df.copy()
+        for j in sorted(changed_rows):
+            new_column = pd.Series(data[j], index=df.index, dtype=object)
+            if df.dtypes.iloc[j] != object:
+                new_column = new_column.infer_objects()
+            df.isetitem(j, new_column)
+        return df, {columns[j]: np.unique(np.concatenate(rows)) for j, rows in changed_rows.items()}
+
+
 class AdvancedExcelProcessor:
+    TITLE_INDICATORS = [
+        'title', 'header', 'section', 'total', 'subtotal',
+        'summary', 'heading', 'chapter'
+    ]
+
     def __init__(self, file_path: str):
         """
         Initialize the Excel processor with a file path.
@@ -13,7 +158,11 @@ class AdvancedExcelProcessor:
         """
         self.file_path = file_path
         self.df = None
-        self.original_df = None
+        # Change tracking: original row position of every current row, rows touched so far
+        # and number of modified cells per column
+        self.row_ids = None
+        self.modified_rows = None
+        self.column_changes = {}
         self.changes = {
             'total_cells': 0,
             'cells_modified': 0,
@@ -29,13 +178,32 @@ class AdvancedExcelProcessor:
         """Load the Excel file into a DataFrame."""
         try:
             self.df = pd.read_excel(self.file_path, header=header)
-            self.original_df = self.df.copy()
             self.changes['total_cells'] = self.df.size
+            self.__reset_tracking()
             return True
         except Exception as e:
             print(f"Error loading file: {str(e)}")
             return False
     
+    def __reset_tracking(self):
+        self.row_ids = np.arange(len(self.df))
+        self.modified_rows = np.zeros(len(self.df), dtype=bool)
+        self.column_changes = {}
+
+    def __ensure_tracking(self):
+        if self.row_ids is None or len(self.row_ids) != len(self.df):
+            self.__reset_tracking()
+
+    def __record_changes(self, column, original_rows: np.ndarray):
+        """Record modified cells of a column, given as row positions in the loaded sheet"""
+        if len(original_rows) == 0:
+            return
+        self.column_changes[column] = self.column_changes.get(column, 0) + len(original_rows)
+        self.modified_rows[original_rows] = True
+        self.changes['cells_modified'] = sum(self.column_changes.values())
+        self.changes['rows_affected'] = int(self.modified_rows.sum())
+        self.changes['columns_affected'] = len(self.column_changes)
+
     def remove_title_rows(self, title_indicators: Optional[List[str]] = None) -> bool:
         """Remove rows that appear to be titles or headers."""
         try:
@@ -43,33 +211,13 @@ class AdvancedExcelProcessor:
                 self.load_file(header=None)
                 
             if title_indicators is None:
-                title_indicators = [
-                    'title', 'header', 'section', 'total', 'subtotal',
-                    'summary', 'heading', 'chapter'
-                ]
+                title_indicators = self.TITLE_INDICATORS
             
-            def is_title_row(row):
-                row_str = ' '.join(str(val).lower() for val in row if pd.notna(val))
-                
-                if any(indicator in row_str.lower() for indicator in title_indicators):
-                    return True
-                    
-                non_empty_cells = sum(pd.notna(val) for val in row)
-                
-                if non_empty_cells <= 2 and len(row) > 4:
-                    return True
-                    
-                if row_str.isupper() and len(row_str) > 5:
-                    return True
-                    
-                if non_empty_cells == 1 and len(row_str) < 50:
-                    return True
-                    
-                return False
-            
-            keep_mask = ~self.df.apply(is_title_row, axis=1)
+            keep_mask = ~self.title_row_mask(self.df, title_indicators)
             title_rows_removed = sum(~keep_mask)
             
+            self.__ensure_tracking()
+            self.row_ids = self.row_ids[keep_mask.to_numpy()]
             self.df = self.df[keep_mask].reset_index(drop=True)
             self.changes['title_rows_removed'] = title_rows_removed
             
@@ -80,6 +228,43 @@ class AdvancedExcelProcessor:
             print(f"Error removing title rows: {str(e)}")
             return False
     
+    @staticmethod
+    def title_row_mask(df: pd.DataFrame, title_indicators: List[str]) -> pd.Series:
+        """
+        Flag the rows that look like titles or headers, column by column.
+
+        A row is a title row when its lowercased cells joined by spaces contain one of the
+        indicators, when it has at most 2 non-empty cells in a sheet wider than 4 columns,
+        when the joined text is uppercase and longer than 5 characters, or when it has a
+        single non-empty cell shorter than 50 characters.
+        """
+        n_rows, n_cols = df.shape
+        values = df.to_numpy(dtype=object)
+        non_empty = np.zeros(n_rows, dtype=np.int64)
+        has_text = np.zeros(n_rows, dtype=bool)
+        row_str = np.full(n_rows, '', dtype=object)
+        for j in range(n_cols):
+            present = pd.notna(values[:, j])
+            if not present.any():
+                continue
+            cells = np.full(n_rows, '', dtype=object)
+            cells[present] = pd.Series(values[present, j], dtype=object).map(str).str.lower().to_numpy(dtype=object)
+            joined = np.where(has_text, row_str + ' ', row_str) + cells
+            row_str = np.where(present, joined, row_str)
+            has_text |= present
+            non_empty += present
+
+        row_str = pd.Series(row_str, index=df.index, dtype=object)
+        row_len = row_str.str.len().to_numpy()
+        mask = np.zeros(n_rows, dtype=bool)
+        if title_indicators:
+            pattern = re.compile('|'.join(map(re.escape, title_indicators)))
+            mask |= row_str.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+        mask |= (non_empty <= 2) & (n_cols > 4)
+        mask |= row_str.str.isupper().to_numpy(dtype=bool) & (row_len > 5)
+        mask |= (non_empty == 1) & (row_len < 50)
+        return pd.Series(mask, index=df.index)
+
     def modify_column(self, column_name: str, modification_function: Callable) -> bool:
         """Modify values in a specified column using a custom function."""
         try:
@@ -93,10 +278,10 @@ class AdvancedExcelProcessor:
             self.df[column_name] = self.df[column_name].apply(modification_function)
             
             # Update changes tracking
-            modified_mask = original_values != self.df[column_name]
-            self.changes['cells_modified'] += sum(modified_mask)
-            self.changes['rows_affected'] = len(set(np.where(modified_mask)[0]))
-            self.changes['columns_affected'] += 1
+            new_values = self.df[column_name]
+            modified_mask = (original_values != new_values) & ~(original_values.isna() & new_values.isna())
+            self.__ensure_tracking()
+            self.__record_changes(column_name, self.row_ids[modified_mask.to_numpy()])
             
             return True
             
@@ -110,52 +295,11 @@ class AdvancedExcelProcessor:
             if self.df is None:
                 self.load_file()
             
-            def is_misplaced(value, column_name):
-                if pd.isna(value):
-                    return False
-                    
-                str_value = str(value).strip()
-                
-                column_rules = {
-                    'date': lambda x: pd.to_datetime(x, errors='coerce') is not pd.NaT,
-                    'email': lambda x: '@' in str(x) and '.' in str(x),
-                    'phone': lambda x: any(c.isdigit() for c in str(x)),
-                    'number': lambda x: str(x).replace('.','').isdigit(),
-                }
-                
-                rule = None
-                for key in column_rules:
-                    if type(key) != str:
-                        if key in column_name:
-                            rule = column_rules[key]
-                            break
-                    if key.lower() in column_name.lower():
-                        rule = column_rules[key]
-                        break
-                
-                if rule:
-                    try:
-                        return not rule(str_value)
-                    except:
-                        return True
-                        
-                return False
-            
             # Process misplaced values
-            for column in self.df.columns:
-                misplaced_mask = self.df[column].apply(lambda x: is_misplaced(x, column))
-                misplaced_values = self.df.loc[misplaced_mask, column].dropna()
-                
-                self.df.loc[misplaced_mask, column] = np.nan
-                
-                for value in misplaced_values:
-                    for other_column in self.df.columns:
-                        if other_column != column and not is_misplaced(value, other_column):
-                            empty_slots = self.df[other_column].isna()
-                            if empty_slots.any():
-                                first_empty = empty_slots.idxmax()
-                                self.df.loc[first_empty, other_column] = value
-                                break
+            self.df, relocated = ColumnRuleEngine().relocate_misplaced(self.df)
+            self.__ensure_tracking()
+            for column, rows in relocated.items():
+                self.__record_changes(column, self.row_ids[rows])
             
             # Remove empty columns
             empty_columns = self.df.columns[self.df.isna().all()]
@@ -173,12 +317,6 @@ class AdvancedExcelProcessor:
             self.changes['whitespace_columns_removed'] = len(whitespace_columns)
             self.changes['total_columns_removed'] = len(empty_columns) + len(whitespace_columns)
             
-            # Update changes tracking
-            cells_modified = (self.original_df != self.df).sum().sum()
-            self.changes['cells_modified'] = cells_modified
-            self.changes['rows_affected'] = len(set(np.where(self.original_df != self.df)[0]))
-            self.changes['columns_affected'] = len(set(np.where(self.original_df != self.df)[1]))
-            
             return True
             
         except Exception as e:
@@ -208,6 +346,138 @@ class AdvancedExcelProcessor:
             print(f"Error saving file: {str(e)}")
             return None, None
 
+    @staticmethod
+    def __iter_spilled(spill):
+        """Yield the chunks pickled to a spill file by the statistics pass"""
+        spill.seek(0)
+        while True:
+            try:
+                yield pickle.load(spill)
+            except EOFError:
+                return
+
+    def __iter_chunks(self, ws, columns: list, first_row: int, chunk_size: int):
+        """
+        Yield (first row position, DataFrame) chunks of a read-only worksheet. Trailing rows
+        without any value are left out, like pd.read_excel does.
+        """
+        rows = []
+        empty_rows = []
+        start = 0
+        for row in ws.iter_rows(min_row=first_row, max_col=len(columns), values_only=True):
+            # Empty rows are held back until a row with values shows they are not trailing
+            if all(v is None or v == '' for v in row):
+                empty_rows.append(row)
+                continue
+            rows.extend(empty_rows)
+            empty_rows = []
+            rows.append(row)
+            while len(rows) >= chunk_size:
+                yield start, pd.DataFrame(rows[:chunk_size], columns=columns, dtype=object)
+                start += chunk_size
+                rows = rows[chunk_size:]
+        if rows:
+            yield start, pd.DataFrame(rows, columns=columns, dtype=object)
+
+    @staticmethod
+    def __has_content(values: np.ndarray) -> np.ndarray:
+        blank = pd.Series(values, dtype=object).map(lambda v: isinstance(v, str) and not v.strip())
+        return pd.notna(values) & ~blank.to_numpy(dtype=bool)
+
+    def process_streaming(self, output_path: Optional[str] = None, chunk_size: int = 5000,
+                          title_indicators: Optional[List[str]] = None, header: Optional[int] = None,
+                          sheet_name: Optional[str] = None) -> Tuple[str, Dict]:
+        """
+        Remove title rows, relocate misplaced values and drop empty columns without loading
+        the workbook into memory. The sheet is read in row chunks through a read-only
+        workbook and written through a constant-memory writer.
+
+        A first statistics pass over the chunks decides which columns are dropped: a column is
+        kept when some non-title row holds a non-blank value that passes its column rule. The
+        parsed chunks are spilled to a temporary file so the workbook is only parsed once.
+        Relocation then works chunk by chunk, so a misplaced value moves to the first empty
+        cell of the same chunk, and never into a dropped column.
+
+        Parameters:
+        header (int): Row number (0-indexed) holding the column names, None for no header
+
+        Returns:
+        Tuple[str, Dict]: (output_path, changes_dictionary)
+        """
+        try:
+            if title_indicators is None:
+                title_indicators = self.TITLE_INDICATORS
+            if output_path is None:
+                input_path = Path(self.file_path)
+                output_path = input_path.parent / f"{input_path.stem}_processed{input_path.suffix}"
+            engine = ColumnRuleEngine()
+            wb_in = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True)
+            ws = wb_in[sheet_name] if sheet_name is not None else wb_in.worksheets[0]
+
+            n_cols = ws.max_column
+            if n_cols is None:
+                n_cols = max((len(row) for row in ws.iter_rows(values_only=True)), default=0)
+            first_row = 1
+            columns = list(range(n_cols))
+            if header is not None:
+                header_row = next(ws.iter_rows(min_row=header + 1, max_row=header + 1, max_col=n_cols, values_only=True))
+                columns = [c if c is not None else f"Unnamed: {j}" for j, c in enumerate(header_row)]
+                first_row = header + 2
+
+            # Statistics pass
+            spill = tempfile.TemporaryFile()
+            n_rows = 0
+            present_count = np.zeros(n_cols, dtype=np.int64)
+            content_count = np.zeros(n_cols, dtype=np.int64)
+            for start, chunk in self.__iter_chunks(ws, columns, first_row, chunk_size):
+                n_rows += len(chunk)
+                keep_mask = ~self.title_row_mask(chunk, title_indicators).to_numpy()
+                kept = chunk[keep_mask]
+                for j, column in enumerate(columns):
+                    values = kept.iloc[:, j].to_numpy(dtype=object)
+                    present_count[j] += pd.notna(values).sum()
+                    content_count[j] += (self.__has_content(values) & ~engine.misplaced_mask(column, values)).sum()
+                pickle.dump((start, keep_mask, kept), spill, protocol=pickle.HIGHEST_PROTOCOL)
+            wb_in.close()
+            keep_columns = [j for j in range(n_cols) if content_count[j] > 0]
+            self.changes['total_cells'] = n_rows * n_cols
+            self.changes['empty_columns_removed'] = int((present_count == 0).sum())
+            self.changes['whitespace_columns_removed'] = n_cols - len(keep_columns) - self.changes['empty_columns_removed']
+            self.changes['total_columns_removed'] = n_cols - len(keep_columns)
+            self.modified_rows = np.zeros(n_rows, dtype=bool)
+            self.column_changes = {}
+
+            # Cleaning pass
+            wb_out = xlsxwriter.Workbook(str(output_path), {
+                'constant_memory': True,
+                'default_date_format': 'yyyy-mm-dd hh:mm:ss'
+            })
+            ws_out = wb_out.add_worksheet(ws.title)
+            ws_out.write_row(0, 0, [columns[j] for j in keep_columns])
+            out_row = 1
+            title_rows_removed = 0
+            for start, keep_mask, chunk in self.__iter_spilled(spill):
+                title_rows_removed += int((~keep_mask).sum())
+                row_ids = start + np.flatnonzero(keep_mask)
+                chunk = chunk.iloc[:, keep_columns].reset_index(drop=True)
+                chunk, relocated = engine.relocate_misplaced(chunk)
+                for column, rows in relocated.items():
+                    self.__record_changes(column, row_ids[rows])
+                for row in chunk.itertuples(index=False, name=None):
+                    ws_out.write_row(out_row, 0, [None if pd.isna(v) else v for v in row])
+                    out_row += 1
+            spill.close()
+            wb_out.close()
+            self.changes['title_rows_removed'] = title_rows_removed
+
+            print(f"Removed {title_rows_removed} title rows")
+            print(f"File saved successfully to {output_path}")
+            return str(output_path), self.changes
+
+        except Exception as e:
+            print(f"Error processing file: {str(e)}")
+            return None, None
+
     def print_summary(self):
         """Print a summary of all changes made to the file."""
         print("\nSummary of changes:")
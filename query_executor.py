@@ -0,0 +1,165 @@
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.pool
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Autocommit connection remembering the statements prepared in its session"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.autocommit = True
+        self.prepared = set()
+
+def to_server_placeholders(query: str) -> Tuple[str, int]:
+    """Rewrite psycopg2 %s placeholders as $1..$n for PREPARE, returning the parameter count"""
+    count = 0
+    def replace(match):
+        nonlocal count
+        if match.group() == '%%':
+            return '%'
+        count += 1
+        return f"${count}"
+    return re.sub(r"%%|%s", replace, query), count
+
+def result_bytes(rows: List[tuple]) -> int:
+    """Approximate size of fetched values: text length for strings, 8 bytes for other values"""
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for row in rows for v in row if v is not None)
+
+
+class QueryExecutor:
+    """
+    Run read queries on a pool of connections as server-side prepared statements, so each
+    distinct query is planned once per connection. Every execution is timed and counted per
+    label; executions slower than slow_ms are written as JSON lines to the slow query log,
+    with their EXPLAIN plan when explain is set.
+    """
+    def __init__(self, db_params: Dict[str, str], max_connections: int = 4, slow_ms: float = 500.0,
+                 explain: bool = False, slow_log: str = 'slow_queries.log', prepare: bool = True):
+        self.db_params = db_params
+        self.max_connections = max_connections
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.prepare = prepare
+        self.pool = None
+        self.stats = {}
+        self.__unpreparable = set()
+        self.__lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        # One logger per slow log file, resolved now so a later working directory change does
+        # not move it; executors writing to the same file share its handler
+        self.slow_log = Path(slow_log).resolve()
+        path_key = hashlib.sha1(str(self.slow_log).encode('utf-8')).hexdigest()[:16]
+        self.slow_logger = logging.getLogger(f'slow_queries.{path_key}')
+        if not self.slow_logger.handlers:
+            handler = logging.FileHandler(self.slow_log, encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.slow_logger.addHandler(handler)
+            self.slow_logger.setLevel(logging.INFO)
+            self.slow_logger.propagate = False
+
+    def __get_pool(self) -> psycopg2.pool.ThreadedConnectionPool:
+        with self.__lock:
+            if self.pool is None:
+                self.pool = psycopg2.pool.ThreadedConnectionPool(
+                    1, self.max_connections, connection_factory=PreparedConnection, **self.db_params)
+            return self.pool
+
+    def __statement(self, cur, query: str, n_params: int) -> Tuple[str, str]:
+        """Prepare query on the cursor's connection if needed; returns its name and the SQL to run"""
+        name = 'q_' + hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+        if not self.prepare or name in self.__unpreparable:
+            return name, query
+        server_query, count = to_server_placeholders(query)
+        if count != n_params:
+            raise ValueError(f"Query expects {count} parameters, got {n_params}")
+        if name not in cur.connection.prepared:
+            try:
+                cur.execute(f"PREPARE {name} AS {server_query}")
+            except (psycopg2.errors.IndeterminateDatatype, psycopg2.errors.AmbiguousParameter) as e:
+                # A parameter whose type PostgreSQL cannot infer without the value; run it
+                # unprepared. Any other error is a real problem with the query and propagates
+                self.logger.warning(f"Could not prepare {name}, executing it directly: {e}")
+                self.__unpreparable.add(name)
+                return name, query
+            cur.connection.prepared.add(name)
+        args = f" ({', '.join(['%s'] * n_params)})" if n_params else ""
+        return name, f"EXECUTE {name}{args}"
+
+    def execute(self, query: str, params: list, label: Optional[str] = None) -> Tuple[List[tuple], List[str]]:
+        """Run a query and return its rows and column names"""
+        pool = self.__get_pool()
+        conn = pool.getconn()
+        broken = False
+        try:
+            cur = conn.cursor()
+            try:
+                name, statement = self.__statement(cur, query, len(params))
+                start = time.perf_counter()
+                cur.execute(statement, params)
+                rows = cur.fetchall()
+                ms = (time.perf_counter() - start) * 1000
+                names = [column.name for column in cur.description]
+                size = result_bytes(rows)
+                self.__record(label or name, ms, len(rows), size)
+                if ms >= self.slow_ms:
+                    self.__log_slow(cur, label or name, name, query, statement, params, ms, len(rows), size)
+                return rows, names
+            finally:
+                cur.close()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            pool.putconn(conn, close=broken or conn.closed)
+
+    def __record(self, label: str, ms: float, rows: int, size: int):
+        with self.__lock:
+            stats = self.stats.setdefault(label, {'executions': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'bytes': 0})
+            stats['executions'] += 1
+            stats['total_ms'] += ms
+            stats['max_ms'] = max(stats['max_ms'], ms)
+            stats['rows'] += rows
+            stats['bytes'] += size
+
+    def __log_slow(self, cur, label: str, name: str, query: str, statement: str, params: list,
+                   ms: float, rows: int, size: int):
+        record = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'label': label,
+            'statement': name,
+            'ms': round(ms, 2),
+            'rows': rows,
+            'bytes': size,
+            'params': params,
+            'query': ' '.join(query.split()),
+        }
+        if self.explain:
+            try:
+                cur.execute(f"EXPLAIN (FORMAT JSON) {statement}", params)
+                record['plan'] = cur.fetchone()[0]
+            except psycopg2.Error as e:
+                record['plan_error'] = str(e)
+        self.slow_logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    def summary(self) -> pd.DataFrame:
+        """Executions, latency, rows and bytes per query label"""
+        with self.__lock:
+            summary = pd.DataFrame.from_dict(self.stats, orient='index')
+        if not summary.empty:
+            summary['mean_ms'] = summary['total_ms'] / summary['executions']
+        return summary
+
+    def close(self):
+        with self.__lock:
+            if self.pool is not None:
+                self.pool.closeall()
+                self.pool = None
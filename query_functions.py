@@ -1,11 +1,17 @@
 import pandas as pd
-import numpy as np
 import re
-import psycopg2
 import logging
 import sys
 from pathlib import Path
 import time
+import json
+import base64
+import hashlib
+from activity_matcher import ActivityPrefixMatcher
+from lead_scoring import LeadSnapshot, LeadScoringEngine
+from compact_frames import compact_frame
+from query_executor import QueryExecutor
+from shareholder_graph import ShareholderGraph
 
 class QueryPrompter:
 
@@ -26,9 +32,28 @@ class QueryPrompter:
         "Number of Businesses" #13
     ]
 
-    def __init__(self, db_params):
+    # Keyset sort key of every query: select-list names, ascending unless followed by DESC.
+    # Columns named key_* only exist for paging and are not returned.
+    PAGE_KEYS = {
+        'all_businesses_capital_query': ['auth_capital', 'key_id'],
+        'industrial_park_businesses_all_query': ['key_park_id', 'key_id', 'act_code'],
+        'businesses_in_industrial_park': ['key_park_id', 'key_id'],
+        'industrial_park_business_capital_query': ['auth_capital', 'key_id'],
+        'industrial_park_businesses_count': ['number_of_businesses', 'zone_name'],
+        'potential_customers_query': ['key_park_id', 'score DESC', 'key_business_id'],
+        'search_businesses_query': ['key_rank', 'key_id'],
+        'related_companies_query': ['hops', 'key_id'],
+    }
+
+    # Reads of general_businesses, rewritten to distinct_businesses when collapsing duplicates
+    BUSINESS_TABLE_PATTERN = re.compile(r"\b(FROM|JOIN)\s+general_businesses\b")
+
+    def __init__(self, db_params, slow_ms: float = 500.0, explain_slow: bool = False, collapse_duplicates: bool = False):
         self.db_params = db_params
+        self.collapse_duplicates = collapse_duplicates
         self.__setup_logging()
+        self.executor = QueryExecutor(db_params, slow_ms=slow_ms, explain=explain_slow)
+        self.__shareholder_graph = None
     
     def __setup_logging(self):
         logging.basicConfig(
@@ -61,31 +86,34 @@ class QueryPrompter:
             except ValueError:
                 print("Invalid value, please enter a number")
     
-    def all_businesses_capital_query(self) -> tuple[str, list, list]:
-        min_capital = self.verify_capital_input()
+    def all_businesses_capital_query(self, min_capital: int|None = None) -> tuple[str, list, list]:
+        if min_capital is None:
+            min_capital = self.verify_capital_input()
         query = """
         SELECT general_businesses.name, 
-               general_businesses.auth_capital
+               general_businesses.auth_capital,
+               general_businesses.id AS key_id
         FROM general_businesses
             WHERE auth_capital > %s
-        ORDER BY auth_capital
         """
         cols = [self.COL_NAME[1], self.COL_NAME[3]]
         return (query, [min_capital], cols)
     
-    def industrial_park_business_capital_query(self):
+    def industrial_park_business_capital_query(self, min_capital: int|None = None):
         rank = {
             0: "general_businesses.name",
             1: "general_businesses.auth_capital",
             2: "industrial_zones.name"
         }
         
-        min_capital = self.verify_capital_input()
+        if min_capital is None:
+            min_capital = self.verify_capital_input()
         
         query = """
         SELECT general_businesses.name as b_name,
                general_businesses.auth_capital as auth_capital,
-               industrial_parks.name as park_name
+               industrial_parks.name as park_name,
+               general_businesses.id as key_id
         FROM general_businesses
             JOIN industrial_parks
                 ON general_businesses.park_id = industrial_parks.id
@@ -96,7 +124,8 @@ class QueryPrompter:
     
     def industrial_park_businesses_all_query(self):
         query = """
-        SELECT general_businesses.name, business_act.act_code, activities.descr, industrial_parks.name  
+        SELECT general_businesses.name, business_act.act_code, activities.descr, industrial_parks.name,
+               general_businesses.park_id AS key_park_id, general_businesses.id AS key_id
         FROM general_businesses 
             JOIN industrial_parks
                 ON general_businesses.park_id = industrial_parks.id
@@ -104,7 +133,7 @@ class QueryPrompter:
                 ON business_act.business_id = general_businesses.id
             JOIN activities
                 ON activities.code = business_act.act_code
-        WHERE main_act = true;
+        WHERE main_act = true
         """
         cols = ["Name", "Activity Code", "Activity Description", "Industrial Zone"]
         return (query, [], cols)
@@ -116,44 +145,264 @@ class QueryPrompter:
             JOIN industrial_parks
                 ON general_businesses.park_id = industrial_parks.id
         GROUP BY industrial_parks.name
-        ORDER BY number_of_businesses
         """
         cols = [self.COL_NAME[12], self.COL_NAME[13]]
         return (query, [], cols)
 
-    def businesses_in_industrial_park(self):
+    def businesses_in_industrial_park(self, zone: str|None = None):
         query = """
         SELECT general_businesses.name as b_name,
-               general_businesses.address as addr
+               general_businesses.address as addr,
+               general_businesses.park_id as key_park_id,
+               general_businesses.id as key_id
         FROM general_businesses
             JOIN industrial_parks
                 ON industrial_parks.id = general_businesses.park_id
-        WHERE industrial_parks.name LIKE %s
+        WHERE industrial_parks.name = %s
         """
-        available_zones = list(map(lambda x: x[0], self.__get_industrial_parks()))
-        for i, z_name in enumerate(available_zones):
-            print(f"{i}. {z_name}")
-        zone = '%' + available_zones[int(input("Enter a zone number: "))]
+        if zone is None:
+            available_zones = list(map(lambda x: x[0], self.__get_industrial_parks()))
+            for i, z_name in enumerate(available_zones):
+                print(f"{i}. {z_name}")
+            zone = available_zones[int(input("Enter a zone number: "))]
         cols = [self.COL_NAME[1], self.COL_NAME[2]]
         return (query, [zone], cols)
 
-    def query_data_raw(self, query: str, query_params: list, **kwargs):
-        conn = psycopg2.connect(**self.db_params)
-        cur = conn.cursor()
+    def potential_customers_query(self, campaign: str|None = None, top_n: int|None = None):
+        # Top N of every park read from the (campaign, park_id, score DESC, business_id) index,
+        # ties broken by business id so the cut and the page order are deterministic
+        query = """
+        SELECT general_businesses.reg_number,
+               general_businesses.name,
+               general_businesses.auth_capital,
+               industrial_parks.name AS park_name,
+               top_leads.score AS score,
+               industrial_parks.id AS key_park_id,
+               top_leads.business_id AS key_business_id
+        FROM industrial_parks
+            CROSS JOIN LATERAL (
+                SELECT potential_customers.business_id, potential_customers.score
+                FROM potential_customers
+                    WHERE potential_customers.campaign = %s
+                      AND potential_customers.park_id = industrial_parks.id
+                ORDER BY potential_customers.score DESC, potential_customers.business_id
+                LIMIT %s
+            ) AS top_leads
+            JOIN general_businesses
+                ON general_businesses.id = top_leads.business_id
+        """
+        if campaign is None:
+            campaigns = list(map(lambda x: x[0], self.query_data_raw("SELECT DISTINCT campaign FROM potential_customers ORDER BY campaign", [])))
+            for i, c_name in enumerate(campaigns):
+                print(f"{i}. {c_name}")
+            campaign = campaigns[int(input("Enter a campaign number: "))]
+        if top_n is None:
+            top_n = input("Enter number of leads per industrial park (default = 10): ").strip()
+            top_n = int(top_n) if top_n else 10
+        cols = [self.COL_NAME[0], self.COL_NAME[1], self.COL_NAME[3], self.COL_NAME[12], "Score"]
+        return (query, [campaign, top_n], cols)
+
+    def business_search(self, text: str, limit: int = 20) -> tuple[str, list, list]:
+        """
+        Ranked lookup by registration number prefix when text is all digits, otherwise by
+        name and address ignoring case and Vietnamese diacritics (pg_trgm word similarity)
+        """
+        text = text.strip()
+        cols = [self.COL_NAME[0], self.COL_NAME[1], self.COL_NAME[2], self.COL_NAME[3], self.COL_NAME[12], "Similarity"]
+        if re.fullmatch(r"\d+", text):
+            query = """
+            SELECT general_businesses.reg_number,
+                   general_businesses.name,
+                   general_businesses.address,
+                   general_businesses.auth_capital,
+                   industrial_parks.name,
+                   1.0,
+                   general_businesses.reg_number AS key_rank,
+                   general_businesses.id AS key_id
+            FROM general_businesses
+                LEFT JOIN industrial_parks
+                    ON industrial_parks.id = general_businesses.park_id
+            WHERE general_businesses.reg_number LIKE %s
+            ORDER BY general_businesses.reg_number
+            LIMIT %s
+            """
+            return (query, [text + '%', limit], cols)
+        query = """
+        SELECT general_businesses.reg_number,
+               general_businesses.name,
+               general_businesses.address,
+               general_businesses.auth_capital,
+               industrial_parks.name,
+               matches.similarity,
+               -matches.similarity AS key_rank,
+               general_businesses.id AS key_id
+        FROM (
+            SELECT id,
+                   GREATEST(word_similarity(search_normalize(%s), search_name),
+                            word_similarity(search_normalize(%s), search_address)) AS similarity
+            FROM general_businesses
+                WHERE search_normalize(%s) <%% search_name
+                   OR search_normalize(%s) <%% search_address
+            ORDER BY similarity DESC, id
+            LIMIT %s
+        ) AS matches
+            JOIN general_businesses
+                ON general_businesses.id = matches.id
+            LEFT JOIN industrial_parks
+                ON industrial_parks.id = general_businesses.park_id
+        """
+        return (query, [text] * 4 + [limit], cols)
 
+    def search_businesses_query(self, text: str|None = None, limit: int|None = None):
+        while not text:
+            text = input("Enter a business name, address or registration number: ").strip()
+        if limit is None:
+            limit = input("Enter maximum number of results (default = 20): ").strip()
+            limit = int(limit) if limit else 20
+        return self.business_search(text, limit)
+
+    @property
+    def shareholder_graph(self) -> ShareholderGraph:
+        """Shareholder network saved by the last import, built from the database if there is none"""
+        if self.__shareholder_graph is None:
+            if ShareholderGraph.DEFAULT_FILE.exists():
+                self.__shareholder_graph = ShareholderGraph.load()
+            else:
+                self.refresh_shareholder_graph()
+        return self.__shareholder_graph
+
+    def refresh_shareholder_graph(self) -> ShareholderGraph:
+        self.__shareholder_graph = ShareholderGraph.from_database(self.db_params)
+        self.__shareholder_graph.save()
+        self.logger.info(f"Built shareholder graph of {len(self.__shareholder_graph)} businesses")
+        return self.__shareholder_graph
+
+    def related_companies_query(self, reg_number: str|None = None, hops: int|None = None):
+        """
+        Businesses linked to a business through shared shareholders, at most hops links away
+        (hops = 0 for its whole ownership group), with their distance
+        """
+        if reg_number is None:
+            reg_number = input("Enter a registration number: ").strip()
+        if hops is None:
+            hops = input("Enter maximum number of shared shareholder links (default = 1, 0 = whole ownership group): ").strip()
+            hops = int(hops) if hops else 1
+        business_ids = [row[0] for row in self.query_data_raw(
+            "SELECT id FROM general_businesses WHERE reg_number = %s", [reg_number], label='business_id_by_reg_number')]
+        graph = self.shareholder_graph
+        related = graph.k_hop(business_ids, hops if hops > 0 else len(graph))
+        query = """
+        SELECT general_businesses.reg_number,
+               general_businesses.name,
+               general_businesses.auth_capital,
+               industrial_parks.name,
+               related.hops AS hops,
+               general_businesses.id AS key_id
+        FROM unnest(%s::int[], %s::int[]) AS related(business_id, hops)
+            JOIN general_businesses
+                ON general_businesses.id = related.business_id
+            LEFT JOIN industrial_parks
+                ON industrial_parks.id = general_businesses.park_id
+        """
+        cols = [self.COL_NAME[0], self.COL_NAME[1], self.COL_NAME[3], self.COL_NAME[12], "Shareholder Links"]
+        return (query, [related['business_id'].tolist(), related['hops'].tolist()], cols)
+
+    def collapse(self, query: str) -> str:
+        """Leave businesses recorded as duplicates out of a query when collapse_duplicates is set"""
+        if not self.collapse_duplicates:
+            return query
+        return self.BUSINESS_TABLE_PATTERN.sub(r"\1 distinct_businesses AS general_businesses", query)
+
+    def query_data_raw(self, query: str, query_params: list, **kwargs):
+        label = kwargs.get('label')
+        query = self.collapse(query)
         try:
-            cur.execute(query, (*query_params,))
-            data = cur.fetchall()
-            self.logger.info("Finish returning query results")
+            start = time.perf_counter()
+            data, _ = self.executor.execute(query, list(query_params), label)
+            self.logger.info(f"Finish returning query results: {label or 'query'}, {len(data)} rows in "
+                             f"{(time.perf_counter() - start) * 1000:.1f} ms")
             return data
         except Exception as e:
-            conn.rollback()
             self.logger.error(str(e))
             raise
-        finally:
-            if conn:
-                cur.close()
-                conn.close()
+
+    def query_stats(self) -> pd.DataFrame:
+        """Executions, latency, rows and bytes fetched per query type since this prompter was created"""
+        return self.executor.summary()
+
+    @staticmethod
+    def __keyset_condition(columns: list[str], descending: list[bool], after: list) -> tuple[str, list]:
+        """WHERE clause selecting the rows after the key values in after, in key order"""
+        if not any(descending) or all(descending):
+            # One direction: a row comparison, which a btree on the key serves directly
+            op = '<' if descending[0] else '>'
+            placeholders = ', '.join(['%s'] * len(columns))
+            return f"({', '.join(f'page.{c}' for c in columns)}) {op} ({placeholders})", list(after)
+        # Mixed directions: (a > x) OR (a = x AND b < y) OR ..., plus a bound on the first key
+        # column so the index scan starts at the previous page instead of the beginning
+        terms, params = [], []
+        for i, (column, desc) in enumerate(zip(columns, descending)):
+            equal = [f"page.{c} = %s" for c in columns[:i]]
+            terms.append('(' + ' AND '.join(equal + [f"page.{column} {'<' if desc else '>'} %s"]) + ')')
+            params += list(after[:i]) + [after[i]]
+        first = f"page.{columns[0]} {'<=' if descending[0] else '>='} %s"
+        return f"{first} AND ({' OR '.join(terms)})", [after[0]] + params
+
+    def query_page(self, query: str, query_params: list, key: list[str], page_size: int|None = 100,
+                   token: str|None = None, label: str|None = None) -> tuple[list, str|None]:
+        """
+        Fetch one page of a query in key order, starting after the row recorded in token.
+        Returns the rows, without the key_* paging columns, and the token of the next page
+        (None on the last page). page_size=None fetches every remaining row.
+        Key columns must not be NULL; with the indexes on the key every page costs the same
+        however deep it is, unlike OFFSET.
+        """
+        digest = hashlib.sha1(repr((query, list(query_params), key)).encode('utf-8')).hexdigest()[:16]
+        after = []
+        if token is not None:
+            state = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            if state['query'] != digest:
+                raise ValueError("Page token does not belong to this query")
+            after = state['after']
+
+        columns = [k.split()[0] for k in key]
+        descending = [k.upper().endswith(' DESC') for k in key]
+        paged_query = f"SELECT * FROM ({self.collapse(query)}) AS page"
+        params = list(query_params)
+        if after:
+            where, where_params = self.__keyset_condition(columns, descending, after)
+            paged_query += f" WHERE {where}"
+            params += where_params
+        paged_query += " ORDER BY " + ', '.join(f"page.{c}{' DESC' if d else ''}" for c, d in zip(columns, descending))
+        if page_size is not None:
+            # One extra row tells whether there is a next page
+            paged_query += " LIMIT %s"
+            params.append(page_size + 1)
+
+        try:
+            rows, names = self.executor.execute(paged_query, params, label)
+        except Exception as e:
+            self.logger.error(str(e))
+            raise
+
+        next_token = None
+        if page_size is not None and len(rows) > page_size:
+            rows = rows[:page_size]
+            last = [rows[-1][names.index(c)] for c in columns]
+            state = json.dumps({'query': digest, 'after': last}, default=str)
+            next_token = base64.urlsafe_b64encode(state.encode('utf-8')).decode('ascii')
+        visible = [i for i, name in enumerate(names) if not name.startswith('key_')]
+        self.logger.info(f"Returning page of {len(rows)} rows")
+        return [tuple(row[i] for i in visible) for row in rows], next_token
+
+    def browse(self, query_name: str, page_size: int = 100, token: str|None = None, **query_args) -> tuple[pd.DataFrame, str|None]:
+        """
+        One page of a named query (a PAGE_KEYS entry) as a DataFrame, plus the token of the next
+        page. query_args are passed to the query method, e.g. min_capital, zone or campaign.
+        """
+        query, query_params, columns = getattr(self, query_name)(**query_args)
+        rows, next_token = self.query_page(query, query_params, self.PAGE_KEYS[query_name], page_size, token, query_name)
+        return pd.DataFrame(rows, columns=columns), next_token
 
     def query_results(self):
         query_options = {
@@ -161,7 +410,10 @@ class QueryPrompter:
             2: self.industrial_park_businesses_all_query,
             3: self.businesses_in_industrial_park,
             4: self.industrial_park_business_capital_query,
-            5: self.industrial_park_businesses_count
+            5: self.industrial_park_businesses_count,
+            6: self.potential_customers_query,
+            7: self.search_businesses_query,
+            8: self.related_companies_query
         }
         print("Query options:\n"
               "\t1. Businesses based on authorized capital\n"
@@ -169,13 +421,18 @@ class QueryPrompter:
               "\t3. Businesses in a specified industrial park\n"
               "\t4. Businessed in industrial park filtered by authorized capital\n"
               "\t5. Number of businesses in industrial parks\n"
+              "\t6. Potential customers of a campaign\n"
+              "\t7. Search businesses by name, address or registration number\n"
+              "\t8. Businesses sharing shareholders with a business\n"
               "\t0. Quit")
         try:
             option = int(input("Enter which query to perform: "))
             if not option:
                 sys.exit(0)
-            query, query_params, columns = query_options[option]()
-            data = self.query_data_raw(query, query_params)
+            query_function = query_options[option]
+            query, query_params, columns = query_function()
+            data, _ = self.query_page(query, query_params, self.PAGE_KEYS[query_function.__name__], page_size=None,
+                                      label=query_function.__name__)
             df = pd.DataFrame(data)
             df.columns = columns
             output_path = Path.cwd() / f"query_output_{time.time()}.xlsx"
@@ -186,47 +443,67 @@ class QueryPrompter:
         return df
 
 class PotentialCustomers(QueryPrompter):
-    def __init__(self, db_params):
-        super().__init__(db_params)
+    def __init__(self, db_params, collapse_duplicates: bool = False):
+        super().__init__(db_params, collapse_duplicates=collapse_duplicates)
         self.__retrieve_raw_data()
     
     def __retrieve_raw_data(self):
-        try:
-            conn = psycopg2.connect(**self.db_params)
-            cur = conn.cursor()
-            cur.execute("""
-            SELECT general_businesses.id AS business_id,
-                general_businesses.name AS business_name,
-                general_businesses.reg_number AS reg_number,
-                general_businesses.auth_capital AS auth_capital,
-                general_businesses.park_id AS park_id,
-                business_act.act_code AS act_code
-            FROM general_businesses
-                JOIN business_act 
-                    ON general_businesses.id = business_act.business_id
-            WHERE general_businesses.park_id is not NULL
-            """)
-            df = pd.DataFrame(cur.fetchall())
-            df.columns = ["business_id", "name", "reg_number", "auth_capital", "park_id", "act_code"]
-            self.logger.info("Finished getting raw data")
-            self.df = df
-            return
-        except Exception as e:
-            conn.rollback()
-            self.logger.error(str(e))
-            raise
-        finally:
-            if conn:
-                cur.close()
-                conn.close()
+        data = self.query_data_raw("""
+        SELECT general_businesses.id AS business_id,
+            general_businesses.name AS business_name,
+            general_businesses.reg_number AS reg_number,
+            general_businesses.auth_capital AS auth_capital,
+            general_businesses.park_id AS park_id,
+            business_act.act_code AS act_code
+        FROM general_businesses
+            JOIN business_act 
+                ON general_businesses.id = business_act.business_id
+        WHERE general_businesses.park_id is not NULL
+        """, [], label='potential_customers_raw_data')
+        df = pd.DataFrame(data, columns=["business_id", "name", "reg_number", "auth_capital", "park_id", "act_code"])
+        self.df = compact_frame(df)
+        self.logger.info("Finished getting raw data")
     
-    def classify(self, targetCost: int = 3e9):
+    def classify(self, targetCost: int = 3e9, actPrefixes: list[str]|None = None):
         dfTemp = self.df
-        actCode = [r'^162[\d]+', r'^20[\d]+', r'^22[\d]+', r'^24[\d]+', r'^25[\d]+', r'^26[\d]+', r'^27[\d]+']
-        mask = (dfTemp['act_code'].apply(lambda x: np.array([re.search(code, x) != None for code in actCode]).any())) & (dfTemp['auth_capital'] > targetCost)
+        matcher = ActivityPrefixMatcher(actPrefixes)
+        mask = matcher.match(dfTemp['act_code']) & (dfTemp['auth_capital'] > targetCost).to_numpy()
         dfCleaned = dfTemp[mask].dropna().drop_duplicates('business_id', keep='first')[['name', 'reg_number', 'auth_capital', 'park_id']].sort_values(by='auth_capital')
         return dfCleaned
     
+    def score_leads(self, config_path: str|None = None, top_n: int|None = None) -> dict[str, pd.DataFrame]:
+        """Rank the top leads per industrial park for every campaign in the scoring config"""
+        try:
+            engine = LeadScoringEngine.from_config(config_path)
+            snapshot = LeadSnapshot.from_database(self.db_params, self.collapse_duplicates)
+            leads = engine.rank_all(snapshot, top_n)
+            self.logger.info(f"Scored {len(snapshot)} businesses against {len(leads)} campaigns")
+            return leads
+        except Exception as e:
+            self.logger.error(str(e))
+            raise
+
+    def with_ownership_groups(self, leads: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add the shareholder group of every lead (group_id, -1 for businesses without shareholders),
+        the size of the group and how many of the leads are in it
+        """
+        groups = self.shareholder_graph.groups(leads['business_id'].to_numpy())
+        leads = leads.assign(group_id=groups['group_id'].to_numpy(), group_size=groups['group_size'].to_numpy())
+        in_group = leads['group_id'].map(leads.loc[leads['group_id'] >= 0, 'group_id'].value_counts())
+        return leads.assign(group_leads=in_group.fillna(1).astype(int).to_numpy())
+
+    def lead_groups(self, leads: pd.DataFrame) -> pd.DataFrame:
+        """Ownership groups holding more than one lead, with their leads' combined authorized capital"""
+        leads = self.with_ownership_groups(leads)
+        leads = leads[(leads['group_id'] >= 0) & (leads['group_leads'] > 1)]
+        return leads.groupby('group_id').agg(
+            group_size=('group_size', 'first'),
+            leads=('business_id', 'nunique'),
+            auth_capital=('auth_capital', 'sum'),
+            business_ids=('business_id', lambda ids: sorted(set(ids))),
+        ).sort_values(['leads', 'auth_capital'], ascending=False)
+
     def export_to_(self, data, f_format: str|None ='csv' ) -> None:
         export_f = {
             'csv': pd.DataFrame.to_csv,
@@ -0,0 +1,174 @@
+import pandas as pd
+import numpy as np
+import re
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List
+
+try:
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Header labels of the raw business registry export -> importer column contract
+RAW_COLUMN_MAP = {
+    'TT': 'no',
+    'Mã số doanh nghiệp': 'reg_number',
+    'Tên doanh nghiệp': 'business_name',
+    'Địa chỉ trụ sở chính': 'address',
+    'Tỉnh / Thành phố': 'province',
+    'Quận / Huyện': 'district',
+    'Phường/xã': 'ward',
+    'Vốn điều lệ': 'auth_cap',
+    'Trạng thái': 'status',
+    'Điện thoại': 'phone',
+    'Email': 'email',
+    'Người đại diện theo pháp luật': 'legal_rep',
+    'Ngành nghề KD chính': 'main_act',
+    'Ngành nghề KD': 'all_act',
+    'Ngày cấp': 'issue_date',
+    'Ngày đăng ký thay đổi': 'change_date',
+    'Loại hình DN': 'model',
+    'Số lượng lao động': 'workforce',
+    'DSThành viên góp vốn': 'co_fund',
+    'DS cổ đông': 'shareholders',
+    'Loại DN (TN: Trong nước)': 'domestic',
+}
+
+IMPORT_COLUMNS = [
+    'no', 'reg_number', 'business_name', 'address', 'province', 'district', 'ward',
+    'auth_cap', 'status', 'phone', 'email', 'legal_rep', 'main_act', 'all_act',
+    'issue_date', 'change_date', 'model', 'workforce', 'co_fund', 'shareholders', 'domestic'
+]
+
+NUMERIC_COLUMNS = ['no', 'auth_cap', 'workforce']
+# Columns a registry must have for its rows to be importable at all
+REQUIRED_COLUMNS = ['reg_number', 'business_name']
+DATE_COLUMNS = ['issue_date', 'change_date']
+
+# Pinned CSV dtypes: everything else is text, so registration numbers and phone numbers
+# keep their leading zeros and the parser never has to infer types chunk by chunk
+CSV_DTYPES = {column: ('float64' if column in NUMERIC_COLUMNS else str)
+              for column in IMPORT_COLUMNS if column not in DATE_COLUMNS}
+
+def normalize_label(label) -> str:
+    return re.sub(r"\s+", "", str(label).lower())
+
+_RAW_LABELS = {normalize_label(label): column for label, column in RAW_COLUMN_MAP.items()}
+_RAW_LABELS.update({column: column for column in IMPORT_COLUMNS})
+
+def contract_columns(names: List) -> Dict:
+    """Map the source column names that belong to the importer contract onto contract names"""
+    mapping = {}
+    for name in names:
+        column = _RAW_LABELS.get(normalize_label(name))
+        if column is not None and column not in mapping.values():
+            mapping[name] = column
+    return mapping
+
+def to_contract(df: pd.DataFrame) -> pd.DataFrame:
+    """Add missing contract columns and order the frame like the importer expects"""
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing registry columns: {', '.join(missing)}")
+    for column in IMPORT_COLUMNS:
+        if column not in df.columns:
+            df[column] = np.nan
+    for column in NUMERIC_COLUMNS:
+        # Whole numbers without gaps come back as integers, like the Excel reader does
+        values = df[column]
+        if values.dtype.kind == 'f' and values.notna().all() and (values % 1 == 0).all():
+            df[column] = values.astype(np.int64)
+    return df[IMPORT_COLUMNS]
+
+
+class RegistrySource(ABC):
+    """A registry file readable into the importer column contract"""
+    def __init__(self, path: str|Path):
+        self.path = Path(path)
+
+    @abstractmethod
+    def read(self) -> pd.DataFrame:
+        ...
+
+
+class ExcelRegistrySource(RegistrySource):
+    def __init__(self, path: str|Path, sheet_name: int|str = 0):
+        super().__init__(path)
+        self.sheet_name = sheet_name
+
+    def read(self) -> pd.DataFrame:
+        df = pd.read_excel(self.path, sheet_name=self.sheet_name)
+        return to_contract(df.rename(columns=contract_columns(df.columns)))
+
+
+class CsvRegistrySource(RegistrySource):
+    """
+    CSV registry read with the C parser in chunks, only the contract columns, with pinned
+    dtypes and ISO dates, so no type inference runs over the data
+    """
+    def __init__(self, path: str|Path, chunksize: int = 100_000, encoding: str = 'utf-8', sep: str = ','):
+        super().__init__(path)
+        self.chunksize = chunksize
+        self.encoding = encoding
+        self.sep = sep
+
+    def read(self) -> pd.DataFrame:
+        header = pd.read_csv(self.path, nrows=0, encoding=self.encoding, sep=self.sep).columns
+        mapping = contract_columns(header)
+        if not mapping:
+            raise ValueError(f"No registry columns found in {self.path}")
+        dtypes = {name: CSV_DTYPES[column] for name, column in mapping.items() if column in CSV_DTYPES}
+        dates = [name for name, column in mapping.items() if column in DATE_COLUMNS]
+        reader = pd.read_csv(self.path, usecols=list(mapping), dtype=dtypes, parse_dates=dates,
+                             date_format='ISO8601', encoding=self.encoding, sep=self.sep,
+                             engine='c', chunksize=self.chunksize)
+        with reader:
+            df = pd.concat(reader, ignore_index=True)
+        return to_contract(df.rename(columns=mapping))
+
+
+class ParquetRegistrySource(RegistrySource):
+    """Parquet registry read with only the contract columns projected out of the file"""
+    def read(self) -> pd.DataFrame:
+        if HAS_PYARROW:
+            names = pq.ParquetFile(self.path).schema_arrow.names
+            mapping = contract_columns(names)
+            df = pd.read_parquet(self.path, columns=list(mapping))
+        else:
+            df = pd.read_parquet(self.path)
+            mapping = contract_columns(df.columns)
+        return to_contract(df.rename(columns=mapping))
+
+
+SOURCES = {
+    '.xlsx': ExcelRegistrySource,
+    '.xls': ExcelRegistrySource,
+    '.xlsm': ExcelRegistrySource,
+    '.csv': CsvRegistrySource,
+    '.txt': CsvRegistrySource,
+    '.parquet': ParquetRegistrySource,
+    '.pq': ParquetRegistrySource,
+}
+
+def open_registry_source(path: str|Path, **kwargs) -> RegistrySource:
+    """
+    Pick the reader for a registry file by its extension, falling back to the file's
+    magic bytes (PAR1 for Parquet, a zip or OLE header for Excel, text otherwise)
+    """
+    path = Path(path)
+    source = SOURCES.get(path.suffix.lower())
+    if source is None:
+        with open(path, 'rb') as f:
+            magic = f.read(8)
+        if magic.startswith(b'PAR1'):
+            source = ParquetRegistrySource
+        elif magic.startswith(b'PK') or magic.startswith(b'\xd0\xcf\x11\xe0'):
+            source = ExcelRegistrySource
+        else:
+            source = CsvRegistrySource
+    return source(path, **kwargs)
+
+def read_registry(path: str|Path, **kwargs) -> pd.DataFrame:
+    return open_registry_source(path, **kwargs).read()
@@ -0,0 +1,189 @@
+import pandas as pd
+import numpy as np
+import psycopg2
+from pathlib import Path
+from typing import Dict, Optional
+
+def component_labels(n_nodes: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """
+    Connected component of every node of an undirected graph given as edge arrays (u, v),
+    labelled 0..n_components-1. Union-find in NumPy: hook the larger root of every edge
+    joining two trees onto the smaller one, then jump pointers to the roots.
+    """
+    parent = np.arange(n_nodes)
+    u = np.asarray(u, dtype=np.int64)
+    v = np.asarray(v, dtype=np.int64)
+    while True:
+        pu, pv = parent[u], parent[v]
+        differ = pu != pv
+        if not differ.any():
+            break
+        np.minimum.at(parent, np.maximum(pu[differ], pv[differ]), np.minimum(pu[differ], pv[differ]))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    return np.unique(parent, return_inverse=True)[1]
+
+class ShareholderGraph:
+    """
+    Business-shareholder ownership graph held as CSR adjacency arrays in both directions
+    (business -> shareholders and shareholder -> businesses).
+
+    Shareholders are identified by their normalized name, so the same owner listed under
+    different shareholder ids still links the businesses. Two businesses are related when
+    they share a shareholder; a group is a connected component of that relation.
+    """
+
+    DEFAULT_FILE = Path(__file__).parent / 'shareholder_graph.npz'
+
+    def __init__(self, business_ids: np.ndarray, shareholder_keys: np.ndarray):
+        business_ids = np.asarray(business_ids, dtype=np.int64)
+        self.business_id, business_idx = np.unique(business_ids, return_inverse=True)
+        shareholder_idx, shareholders = pd.factorize(pd.Series(shareholder_keys, dtype=object))
+        self.n_shareholders = len(shareholders)
+        # Duplicate links would inflate the shared shareholder counts
+        edges = np.unique(business_idx.astype(np.int64) * max(self.n_shareholders, 1) + shareholder_idx)
+        business_idx, shareholder_idx = np.divmod(edges, max(self.n_shareholders, 1))
+        self.b_indptr, self.b_indices = self.__csr(business_idx, shareholder_idx, len(self.business_id))
+        self.s_indptr, self.s_indices = self.__csr(shareholder_idx, business_idx, self.n_shareholders)
+        self.__group = None
+
+    @staticmethod
+    def __csr(rows: np.ndarray, cols: np.ndarray, n_rows: int):
+        order = np.argsort(rows, kind='stable')
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+        return indptr, cols[order].astype(np.int32)
+
+    @staticmethod
+    def __gather(indptr: np.ndarray, indices: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        """Concatenated neighbour lists of nodes"""
+        starts = indptr[nodes]
+        lengths = indptr[nodes + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return indices[offsets + np.arange(lengths.sum())]
+
+    def __len__(self):
+        return len(self.business_id)
+
+    @classmethod
+    def from_database(cls, db_params: Dict[str, str]) -> "ShareholderGraph":
+        conn = psycopg2.connect(**db_params)
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT business_shareholder.business_id, lower(shareholders.name)
+                FROM business_shareholder
+                    JOIN shareholders
+                        ON shareholders.id = business_shareholder.shareholder_id
+            """)
+            links = pd.DataFrame(cur.fetchall(), columns=['business_id', 'shareholder'])
+            return cls(links['business_id'].to_numpy(), links['shareholder'].to_numpy())
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    def save(self, path: Optional[str|Path] = None) -> Path:
+        path = Path(path or self.DEFAULT_FILE)
+        with open(path, 'wb') as f:
+            np.savez(f, business_id=self.business_id, b_indptr=self.b_indptr, b_indices=self.b_indices,
+                     s_indptr=self.s_indptr, s_indices=self.s_indices)
+        return path
+
+    @classmethod
+    def load(cls, path: Optional[str|Path] = None) -> "ShareholderGraph":
+        with np.load(path or cls.DEFAULT_FILE) as arrays:
+            graph = cls.__new__(cls)
+            for name in ['business_id', 'b_indptr', 'b_indices', 's_indptr', 's_indices']:
+                setattr(graph, name, arrays[name])
+        graph.n_shareholders = len(graph.s_indptr) - 1
+        graph._ShareholderGraph__group = None
+        return graph
+
+    def __positions(self, business_ids) -> tuple[np.ndarray, np.ndarray]:
+        """Index of each business id in the graph and whether the business is in it at all"""
+        business_ids = np.atleast_1d(np.asarray(business_ids, dtype=np.int64))
+        if not len(self):
+            return np.zeros(len(business_ids), dtype=np.int64), np.zeros(len(business_ids), dtype=bool)
+        pos = np.searchsorted(self.business_id, business_ids).clip(0, len(self) - 1)
+        return pos, self.business_id[pos] == business_ids
+
+    def __index_of(self, business_ids) -> np.ndarray:
+        pos, found = self.__positions(business_ids)
+        return pos[found]
+
+    def related(self, business_id: int) -> pd.DataFrame:
+        """Businesses sharing at least one shareholder with business_id, most shared first"""
+        idx = self.__index_of(business_id)
+        shareholders = self.__gather(self.b_indptr, self.b_indices, idx)
+        businesses = self.__gather(self.s_indptr, self.s_indices, shareholders)
+        businesses = businesses[~np.isin(businesses, idx)]
+        related, shared = np.unique(businesses, return_counts=True)
+        order = np.lexsort((self.business_id[related], -shared))
+        return pd.DataFrame({
+            'business_id': self.business_id[related[order]],
+            'shared_shareholders': shared[order],
+        })
+
+    def k_hop(self, business_id: int, k: int = 2) -> pd.DataFrame:
+        """Businesses reachable from business_id through at most k shared shareholders, with their distance"""
+        hops = np.full(len(self), -1, dtype=np.int32)
+        frontier = self.__index_of(business_id)
+        hops[frontier] = 0
+        seen_shareholders = np.zeros(self.n_shareholders, dtype=bool)
+        for hop in range(1, k + 1):
+            if not len(frontier):
+                break
+            shareholders = np.unique(self.__gather(self.b_indptr, self.b_indices, frontier))
+            shareholders = shareholders[~seen_shareholders[shareholders]]
+            seen_shareholders[shareholders] = True
+            frontier = np.unique(self.__gather(self.s_indptr, self.s_indices, shareholders))
+            frontier = frontier[hops[frontier] < 0]
+            hops[frontier] = hop
+        reached = np.flatnonzero(hops > 0)
+        order = np.lexsort((self.business_id[reached], hops[reached]))
+        return pd.DataFrame({
+            'business_id': self.business_id[reached[order]],
+            'hops': hops[reached[order]],
+        })
+
+    @property
+    def group(self) -> np.ndarray:
+        """Connected group label of every business (aligned with business_id)"""
+        if self.__group is None:
+            n_businesses = len(self)
+            # Components over business and shareholder nodes, kept for the businesses only
+            u = np.repeat(np.arange(n_businesses), np.diff(self.b_indptr))
+            v = self.b_indices.astype(np.int64) + n_businesses
+            labels = component_labels(n_businesses + self.n_shareholders, u, v)
+            _, self.__group = np.unique(labels[:n_businesses], return_inverse=True)
+        return self.__group
+
+    def connected_group(self, business_id: int) -> np.ndarray:
+        """Ids of every business in the same ownership group as business_id, itself included"""
+        idx = self.__index_of(business_id)
+        if not len(idx):
+            return np.array([business_id], dtype=np.int64)
+        return self.business_id[self.group == self.group[idx[0]]]
+
+    def groups(self, business_ids=None) -> pd.DataFrame:
+        """
+        Group id and group size of the given businesses (all businesses in the graph by default);
+        businesses without shareholders are their own group of one, with group id -1
+        """
+        sizes = np.bincount(self.group)
+        if business_ids is None:
+            return pd.DataFrame({'business_id': self.business_id, 'group_id': self.group, 'group_size': sizes[self.group]})
+        business_ids = np.atleast_1d(np.asarray(business_ids, dtype=np.int64))
+        pos, found = self.__positions(business_ids)
+        group = self.group[pos] if len(self) else np.zeros(len(business_ids), dtype=np.int64)
+        return pd.DataFrame({
+            'business_id': business_ids,
+            'group_id': np.where(found, group, -1),
+            'group_size': np.where(found, sizes[group] if len(self) else 1, 1),
+        })
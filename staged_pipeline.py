@@ -0,0 +1,111 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+_END = object()
+
+class MeteredQueue(queue.Queue):
+    """Bounded queue recording its depth every time an item is put"""
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self.max_depth = 0
+        self.depth_total = 0
+        self.puts = 0
+
+    def _put(self, item):
+        super()._put(item)
+        depth = len(self.queue)
+        self.max_depth = max(self.max_depth, depth)
+        self.depth_total += depth
+        self.puts += 1
+
+
+class StagedPipeline:
+    """
+    Run a chain of stages concurrently, one thread per stage, connected by bounded queues.
+    Items from the source go through the stage functions in order; a full queue blocks the
+    stage feeding it (backpressure). The first exception raised by any stage stops the
+    pipeline and is re-raised by run().
+    """
+    def __init__(self, source: Iterable, stages: List[Tuple[str, Callable]], maxsize: int = 500):
+        self.source = source
+        self.stages = stages
+        self.queues = [MeteredQueue(maxsize) for _ in stages]
+        self.processed = {name: 0 for name, _ in stages}
+        self.busy_seconds = {name: 0.0 for name, _ in stages}
+        self.error = None
+        self.__stop = threading.Event()
+
+    def __put(self, q: queue.Queue, item):
+        while not self.__stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def __get(self, q: queue.Queue):
+        while not self.__stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def __fail(self, e: BaseException):
+        if self.error is None:
+            self.error = e
+        self.__stop.set()
+
+    def __feed(self):
+        try:
+            for item in self.source:
+                if self.__stop.is_set():
+                    return
+                self.__put(self.queues[0], item)
+            self.__put(self.queues[0], _END)
+        except BaseException as e:
+            self.__fail(e)
+
+    def __work(self, i: int):
+        name, func = self.stages[i]
+        out_q = self.queues[i + 1] if i + 1 < len(self.stages) else None
+        try:
+            while True:
+                item = self.__get(self.queues[i])
+                if item is _END:
+                    if out_q is not None:
+                        self.__put(out_q, _END)
+                    return
+                start = time.perf_counter()
+                result = func(item)
+                self.busy_seconds[name] += time.perf_counter() - start
+                self.processed[name] += 1
+                if out_q is not None:
+                    self.__put(out_q, result)
+        except BaseException as e:
+            self.__fail(e)
+
+    def run(self):
+        threads = [threading.Thread(target=self.__feed, name='pipeline-source', daemon=True)]
+        threads += [threading.Thread(target=self.__work, args=(i,), name=f"pipeline-{name}", daemon=True)
+                    for i, (name, _) in enumerate(self.stages)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if self.error is not None:
+            raise self.error
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Items processed, busy time and input queue depth of every stage"""
+        return {
+            name: {
+                'processed': self.processed[name],
+                'busy_seconds': round(self.busy_seconds[name], 3),
+                'max_queue_depth': q.max_depth,
+                'mean_queue_depth': round(q.depth_total / q.puts, 1) if q.puts else 0.0,
+            }
+            for (name, _), q in zip(self.stages, self.queues)
+        }
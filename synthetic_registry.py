@@ -0,0 +1,199 @@
+import pandas as pd
+import numpy as np
+import psycopg2
+import re
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+from registry_sources import RAW_COLUMN_MAP, IMPORT_COLUMNS
+
+AREAS_SCRIPT = Path(__file__).parent / 'postgres_setup_scripts' / 'admin_divisions_import_script.txt'
+PARKS_SCRIPT = Path(__file__).parent / 'postgres_setup_scripts' / 'industrial_parks_import_script.txt'
+
+def load_areas(db_params: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Return the areas table (code, full_name, parent_code), from the database when
+    db_params is given, otherwise parsed from the admin divisions setup script.
+    """
+    if db_params is not None:
+        conn = psycopg2.connect(**db_params)
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT code, full_name, parent_code FROM areas")
+            return pd.DataFrame(cur.fetchall(), columns=['code', 'full_name', 'parent_code'])
+        finally:
+            cur.close()
+            conn.close()
+    rows = []
+    columns = None
+    value = r"'((?:[^']|'')*)'|(NULL|-?\d+)"
+    for line in open(AREAS_SCRIPT, encoding='utf-8'):
+        header = re.match(r"INSERT INTO areas\(([^)]*)\)", line)
+        if header:
+            columns = header.group(1).split(',')
+            continue
+        if columns is None or not line.startswith('('):
+            continue
+        values = [q.replace("''", "'") if n == '' else n for q, n in re.findall(value, line)]
+        record = dict(zip(columns, values))
+        rows.append((record['code'], record['full_name'], record.get('parent_code')))
+    return pd.DataFrame(rows, columns=['code', 'full_name', 'parent_code'])
+
+def load_park_names() -> List[str]:
+    """Industrial park names from the industrial parks setup script"""
+    return re.findall(r"\('([^']+)',", open(PARKS_SCRIPT, encoding='utf-8').read())
+
+
+class SyntheticRegistryGenerator:
+    """
+    Generate synthetic business registries shaped like the provincial registry exports:
+    province/district/ward strings drawn from areas, addresses inside industrial parks
+    written as KCN / Khu công nghiệp with roman or arabic numerals, main and secondary
+    VSIC activities, shareholder lists, and for raw sheets the title rows around the data.
+    """
+
+    STREETS = ['Thôn', 'Ấp', 'Tổ', 'Khu phố', 'Đường ĐT', 'Quốc lộ']
+    SURNAMES = ['NGUYỄN', 'TRẦN', 'LÊ', 'PHẠM', 'HOÀNG', 'HUỲNH', 'PHAN', 'VŨ', 'VÕ', 'ĐẶNG', 'BÙI', 'ĐỖ']
+    GIVEN_NAMES = ['VĂN AN', 'THỊ BÌNH', 'MINH CHÂU', 'HỒNG DŨNG', 'QUỐC HÙNG', 'THANH HÀ', 'ĐỨC LONG', 'NGỌC MAI']
+    COMPANY_TYPES = [
+        ('CÔNG TY TNHH', 'Công ty trách nhiệm hữu hạn hai thành viên trở lên'),
+        ('CÔNG TY TNHH MỘT THÀNH VIÊN', 'Công ty trách nhiệm hữu hạn một thành viên'),
+        ('CÔNG TY CỔ PHẦN', 'Công ty cổ phần'),
+        ('DOANH NGHIỆP TƯ NHÂN', 'Doanh nghiệp tư nhân'),
+    ]
+    BUSINESS_WORDS = ['THƯƠNG MẠI', 'DỊCH VỤ', 'SẢN XUẤT', 'XÂY DỰNG', 'GỖ', 'CAO SU', 'NÔNG SẢN', 'CƠ KHÍ', 'ĐIỆN TỬ', 'HÓA CHẤT']
+    ACTIVITY_WORDS = ['Sản xuất', 'Bán buôn', 'Bán lẻ', 'Chế biến', 'Lắp đặt', 'Dịch vụ', 'Vận tải']
+    ACTIVITY_OBJECTS = ['gỗ', 'hóa chất', 'cao su', 'kim loại', 'linh kiện điện tử', 'thiết bị điện', 'nông sản', 'nhiên liệu']
+    TITLE_ROWS = ['SỞ KẾ HOẠCH VÀ ĐẦU TƯ', 'DANH SÁCH DOANH NGHIỆP ĐĂNG KÝ THÀNH LẬP', 'TỔNG CỘNG']
+
+    def __init__(self, areas: Optional[pd.DataFrame] = None, park_names: Optional[List[str]] = None,
+                 kcn_ratio: float = 0.2, seed: int = 0):
+        if areas is None:
+            areas = load_areas()
+        self.park_names = park_names if park_names is not None else load_park_names()
+        self.kcn_ratio = kcn_ratio
+        self.rng = np.random.default_rng(seed)
+        self.__build_wards(areas)
+        self.__build_activities()
+
+    def __build_wards(self, areas: pd.DataFrame):
+        """Flatten the areas hierarchy into (province, district, ward) triples"""
+        by_code = areas.set_index('code')
+        wards = areas[areas['parent_code'].isin(by_code.index)]
+        wards = wards[wards['parent_code'].map(by_code['parent_code']).isin(by_code.index)]
+        district = by_code.loc[wards['parent_code']]
+        province = by_code.loc[district['parent_code']]
+        triples = pd.DataFrame({
+            'province': province['full_name'].to_numpy(),
+            'district': district['full_name'].to_numpy(),
+            'ward': wards['full_name'].to_numpy(),
+        })
+        # The importer only parses provinces written as "Tỉnh ..."
+        self.wards = triples[triples['province'].str.startswith('Tỉnh')].reset_index(drop=True)
+
+    def __build_activities(self, n_codes: int = 600):
+        codes = np.unique(self.rng.integers(1000, 9999, n_codes)).astype(str)
+        # Make sure the manufacturing prefixes used by the lead campaigns are present
+        codes = np.unique(np.concatenate([codes, ['1622', '2011', '2220', '2410', '2511', '2610', '2710']]))
+        descr = [f"{self.rng.choice(self.ACTIVITY_WORDS)} {self.rng.choice(self.ACTIVITY_OBJECTS)}" for _ in codes]
+        self.activities = np.array([f"{c}:{d}" for c, d in zip(codes, descr)], dtype=object)
+
+    def __park_address(self, park: str) -> str:
+        """Write a park name the way registry addresses do, with varied prefixes and numerals"""
+        roman = re.search(r" ([IVX]+)$", park)
+        name = park.title()
+        if roman is not None and self.rng.random() < 0.5:
+            number = {'I': 1, 'II': 2, 'III': 3, 'IV': 4, 'V': 5}.get(roman.group(1), 1)
+            name = re.sub(r" [IVX]+$", '', park).title() + f" {number}"
+        elif roman is not None:
+            name = re.sub(r" [IVX]+$", '', park).title() + " " + roman.group(1)
+        prefix = self.rng.choice(['KCN', 'Khu công nghiệp', 'Khu Công Nghiệp', 'khu công nghiệp'])
+        return f"Lô {self.rng.choice(list('ABCDE'))}{self.rng.integers(1, 30)}, {prefix} {name}"
+
+    def generate(self, n_rows: int) -> pd.DataFrame:
+        """Generate a processed registry following the importer column contract"""
+        rng = self.rng
+        area = self.wards.iloc[rng.integers(0, len(self.wards), n_rows)].reset_index(drop=True)
+        in_park = rng.random(n_rows) < self.kcn_ratio
+        streets = [f"{rng.choice(self.STREETS)} {rng.integers(1, 20)}" for _ in range(n_rows)]
+        parks = rng.choice(self.park_names, n_rows) if self.park_names else np.full(n_rows, '')
+        first_part = [self.__park_address(p) if k else s for p, k, s in zip(parks, in_park, streets)]
+        address = [f"{f}, {w}, {d}, {p}, Việt Nam" for f, w, d, p in zip(first_part, area['ward'], area['district'], area['province'])]
+
+        types = rng.integers(0, len(self.COMPANY_TYPES), n_rows)
+        words = rng.choice(self.BUSINESS_WORDS, (n_rows, 2))
+        business_name = [f"{self.COMPANY_TYPES[t][0]} {w[0]} {w[1]} {i}" for i, (t, w) in enumerate(zip(types, words))]
+
+        n_acts = rng.integers(1, 12, n_rows)
+        act_idx = rng.integers(0, len(self.activities), n_acts.sum())
+        act_splits = np.split(self.activities[act_idx], np.cumsum(n_acts)[:-1])
+        people = [f"{s} {g}" for s in self.SURNAMES for g in self.GIVEN_NAMES]
+        def name_list(prob):
+            has = rng.random(n_rows) < prob
+            counts = rng.integers(1, 6, n_rows)
+            return [', '.join(rng.choice(people, c, replace=False)) if h else np.nan for h, c in zip(has, counts)]
+
+        df = pd.DataFrame({
+            'no': np.arange(1, n_rows + 1),
+            'reg_number': (3800000000 + rng.choice(10**8, n_rows, replace=False)).astype(str),
+            'business_name': business_name,
+            'address': address,
+            'province': area['province'],
+            'district': area['district'],
+            'ward': area['ward'],
+            'auth_cap': rng.choice([5e8, 1e9, 2e9, 3e9, 5e9, 1e10, 5e10], n_rows).astype(np.int64),
+            'status': 'Đang hoạt động',
+            'phone': [f"0{rng.integers(200, 999)}{rng.integers(1000000, 9999999)}" for _ in range(n_rows)],
+            'email': [f"contact{i}@example.vn" if e else np.nan for i, e in enumerate(rng.random(n_rows) < 0.3)],
+            'legal_rep': rng.choice(people, n_rows),
+            'main_act': [acts[0] for acts in act_splits],
+            'all_act': [','.join(acts) for acts in act_splits],
+            'issue_date': pd.Timestamp('1997-01-01') + pd.to_timedelta(rng.integers(0, 10000, n_rows), unit='D'),
+            'change_date': pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3500, n_rows), unit='D'),
+            'model': [self.COMPANY_TYPES[t][1] for t in types],
+            'workforce': rng.integers(1, 500, n_rows).astype(float),
+            'co_fund': name_list(0.2),
+            'shareholders': name_list(0.1),
+            'domestic': np.where(rng.random(n_rows) < 0.85, 'TN', 'NN'),
+        })
+        return df[IMPORT_COLUMNS]
+
+    def generate_raw(self, n_rows: int, title_row_every: int = 5000) -> pd.DataFrame:
+        """
+        Generate a raw registry sheet (no header): title rows, the Vietnamese header row and the
+        data rows, with a dirty total row inserted every title_row_every rows
+        """
+        df = self.generate(n_rows).drop(columns=['province'])
+        labels = {column: label for label, column in RAW_COLUMN_MAP.items()}
+        header = [labels[c] for c in df.columns]
+        n_cols = len(header)
+        def title(text):
+            return [text] + [np.nan] * (n_cols - 1)
+        rows = [title(self.TITLE_ROWS[0]), [np.nan] * n_cols, title(self.TITLE_ROWS[1]), header]
+        data = df.astype(object).where(df.notna(), np.nan).values.tolist()
+        for start in range(0, n_rows, title_row_every):
+            rows.extend(data[start:start + title_row_every])
+            rows.append(title(f"{self.TITLE_ROWS[2]}: {min(start + title_row_every, n_rows)}"))
+        return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic business registry")
+    parser.add_argument('rows', type=int, help="Number of businesses, e.g. 10000, 100000 or 1000000")
+    parser.add_argument('output', help="Output file (.xlsx, .csv or .parquet)")
+    parser.add_argument('--raw', action='store_true', help="Write a raw sheet with title rows instead of a processed one")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generator = SyntheticRegistryGenerator(seed=args.seed)
+    df = generator.generate_raw(args.rows) if args.raw else generator.generate(args.rows)
+    output = Path(args.output)
+    if output.suffix == '.csv':
+        df.to_csv(output, index=False, header=not args.raw)
+    elif output.suffix == '.parquet':
+        df.to_parquet(output, index=False)
+    else:
+        df.to_excel(output, index=False, header=not args.raw)
+    print(f"Wrote {len(df)} rows to {output}")
+
+if __name__ == "__main__":
+    main()